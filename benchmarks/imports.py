@@ -0,0 +1,98 @@
+import argparse
+import json
+import subprocess
+import sys
+
+# seconds a fresh interpreter may spend importing each module, best of a few runs
+BUDGETS = {'profiling': 0.05,
+           'chart': 0.8,
+           'prepper.combine': 0.75,
+           'prepper.stats': 0.75,
+           'render': 1.25}
+
+# modules that must only be loaded once they are needed, never by importing the key module
+DEFERRED = {'chart': ['matplotlib.pyplot', 'pandas', 'scipy', 'sklearn'],
+            'prepper.combine': ['matplotlib', 'scipy', 'sklearn'],
+            'prepper.stats': ['matplotlib', 'scipy', 'sklearn'],
+            'render': ['matplotlib.pyplot', 'scipy', 'sklearn']}
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'modules': sorted(sys.modules)}}))
+"""
+
+
+def measure_import(module, repeat=3):
+    """
+    time importing a module in fresh interpreters
+
+    :param module: dotted name of the module
+    :type module: str
+
+    :param repeat: number of interpreters to start
+    :type repeat: int
+
+    :return seconds, modules: best import time and every module loaded by the import
+    :rtype seconds, modules: (float, list)
+    """
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', _PROBE.format(module=module)],
+                             capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(out.splitlines()[-1]))
+    return min(run['seconds'] for run in runs), runs[-1]['modules']
+
+
+def check(budgets=None, repeat=3, scale=1.0):
+    """
+    measure every module in budgets and report the ones over budget or loading a deferred module
+
+    :param budgets: module to seconds pairs, defaults to BUDGETS
+    :type budgets: dict
+
+    :param repeat: number of interpreters to start per module
+    :type repeat: int
+
+    :param scale: multiplier of every budget, for slower machines
+    :type scale: float
+
+    :return results, failures: one dict per module with module, seconds, budget and loaded deferred
+        modules, and one message per failure
+    :rtype results, failures: (list, list)
+    """
+    results = []
+    failures = []
+    for module, budget in (budgets or BUDGETS).items():
+        seconds, modules = measure_import(module, repeat=repeat)
+        budget *= scale
+        loaded = [name for name in DEFERRED.get(module, []) if name in modules]
+        results.append({'module': module, 'seconds': seconds, 'budget': budget, 'deferred_loaded': loaded})
+
+        if seconds > budget:
+            failures.append(f'import {module} took {seconds:.3f} s, budget is {budget:.3f} s')
+        if loaded:
+            failures.append(f'import {module} loaded {", ".join(loaded)}')
+
+    return results, failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check the import time of the pySCC modules against a budget.')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='fresh interpreters per module')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiply every budget, for slower machines')
+    args = parser.parse_args(argv)
+
+    results, failures = check(repeat=args.repeat, scale=args.scale)
+    for result in results:
+        print(f"{result['module']:<16} {result['seconds']:8.3f} s  budget {result['budget']:6.3f} s")
+    for failure in failures:
+        print(f'FAIL {failure}', file=sys.stderr)
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
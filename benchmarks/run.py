@@ -0,0 +1,177 @@
+import argparse
+import gc
+import io
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import matplotlib as mpl
+mpl.use('Agg')  # noqa: E402 benchmarks never display anything
+
+import pandas as pd
+
+from benchmarks.synthetic import generate
+from chart import SCC
+from prepper.combine import combine_all, combine_cr
+from prepper.stats import stats
+
+# clients, targets per client, phases, years of history, timesheet rows per day
+SCALES = {'small': dict(clients=1, targets=5, phases=3, years=1, timesheet_rows_per_day=3),
+          'medium': dict(clients=10, targets=20, phases=6, years=2, timesheet_rows_per_day=4),
+          'large': dict(clients=50, targets=50, phases=12, years=3, timesheet_rows_per_day=6)}
+
+
+def measure(func, repeat=3):
+    """
+    best wall time and peak traced memory of func over repeat runs
+
+    :param func: function without arguments to measure
+    :type func: callable
+
+    :param repeat: number of runs
+    :type repeat: int
+
+    :return seconds, peak_bytes, result: best time, peak memory of the first run and result of the last run
+    :rtype seconds, peak_bytes, result: (float, int, object)
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    seconds = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        seconds.append(time.perf_counter() - start)
+
+    return min(seconds), peak_bytes, result
+
+
+def run_scale(scale, repeat=3):
+    """
+    time and memory profile every pipeline stage on synthetic exports of a scale
+
+    :param scale: name of a scale in SCALES
+    :type scale: str
+
+    :param repeat: number of timed runs per stage
+    :type repeat: int
+
+    :return results: one dict per stage with stage, scale, rows, seconds and peak_bytes
+    :rtype results: list
+    """
+    timesheets, data = generate(**SCALES[scale])
+    client = timesheets.ClientId.iloc[0]
+    client_timesheets = timesheets[timesheets.ClientId == client]
+    client_data = data[data.ClientId == client]
+    targets = list(pd.unique(client_data.Target))
+
+    results = []
+
+    def record(stage, func, rows):
+        seconds, peak_bytes, result = measure(func, repeat=repeat)
+        results.append({'stage': stage, 'scale': scale, 'rows': int(rows),
+                        'seconds': seconds, 'peak_bytes': int(peak_bytes)})
+        return result
+
+    # one target of one client
+    combined = record('combine_cr',
+                      lambda: combine_cr(client_timesheets, client_data[client_data.Target == targets[0]]),
+                      len(client_timesheets) + (client_data.Target == targets[0]).sum())
+
+    # every target of every client
+    record('combine_all', lambda: combine_all(timesheets, data), len(timesheets) + len(data))
+
+    # every target of one client side by side, all targets share the client's phases
+    wide = combined.rename(columns={'data_decel': f'data_{0}'})
+    target_data = combine_all(client_timesheets, client_data).loc[client]
+    for i, target in enumerate(targets[1:], start=1):
+        wide[f'data_{i}'] = target_data.loc[target].data_decel
+    wide = wide.dropna()
+
+    record('stats', lambda: stats(wide), len(wide))
+
+    chart_data = wide[[col for col in wide.columns if col.startswith('data_')] + ['counting']]
+    scc = SCC(chart_data)
+
+    def assign():
+        scc.data = chart_data
+
+    record('SCC.data', assign, len(chart_data))
+
+    def plot():
+        chart = SCC(chart_data)
+        chart.plot(show=False)
+        chart.save(io.BytesIO(), format='png')
+        chart.close()
+
+    record('SCC.plot', plot, len(chart_data))
+    scc.close()
+
+    return results
+
+
+def compare(results, baseline):
+    """
+    print the time and memory of results relative to a baseline run
+
+    :param results: results of this run
+    :type results: list
+
+    :param baseline: results of an earlier run
+    :type baseline: list
+    """
+    earlier = {(result['stage'], result['scale']): result for result in baseline}
+    for result in results:
+        before = earlier.get((result['stage'], result['scale']))
+        if before is None:
+            continue
+        print(f"{result['scale']:>8} {result['stage']:<12} "
+              f"time x{before['seconds'] / result['seconds']:.2f}  "
+              f"memory x{before['peak_bytes'] / max(result['peak_bytes'], 1):.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the pySCC pipeline on synthetic CentralReach exports.')
+    parser.add_argument('-s', '--scale', dest='scales', action='append', choices=list(SCALES),
+                        help='scale to run, may be given more than once (default: small)')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='timed runs per stage')
+    parser.add_argument('-o', '--output', help='write the results as json to this file')
+    parser.add_argument('-c', '--compare', help='json results of an earlier run to compare against')
+    args = parser.parse_args(argv)
+
+    results = []
+    for scale in args.scales or ['small']:
+        for result in run_scale(scale, repeat=args.repeat):
+            print(f"{result['scale']:>8} {result['stage']:<12} {result['rows']:>10} rows "
+                  f"{result['seconds']:10.4f} s {result['peak_bytes'] / 2 ** 20:10.1f} MiB")
+            results.append(result)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f)['results'])
+
+    if args.output:
+        try:
+            commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                    capture_output=True, text=True).stdout.strip()
+        except OSError:
+            commit = None
+        with open(args.output, 'w') as f:
+            json.dump({'commit': commit,
+                       'python': platform.python_version(),
+                       'pandas': pd.__version__,
+                       'matplotlib': mpl.__version__,
+                       'results': results}, f, indent=2)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,161 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# every column of a CentralReach timesheets export, most of them are never read by prepper
+TIMESHEET_HEADER = ['Id', 'DateOfService', 'DateTimeFrom', 'DateTimeTo', 'ClientId', 'ClientFirstName',
+                    'ClientLastName', 'ClientContactLabels', 'ProviderId', 'ProviderFirstName', 'ProviderLastName',
+                    'ProviderContactLabels', 'AuthorizationId', 'AuthorizationResourceId', 'ProcedureCodeId',
+                    'ProcedureCode', 'ProcedureCodeDescription', 'CodeLabels', 'Location', 'TimeWorkedInMins',
+                    'TimeWorkedInHours', 'UnitsOfService', 'DriveTimeMinutes', 'Mileage', 'BillingLabels',
+                    'ClientSignature', 'ProviderSignature', 'PayorId', 'PayorName', 'ProviderCharges',
+                    'RateProvider', 'RateProviderDriveHourly', 'RateProviderDriveMileage', 'ProviderDriveCharge',
+                    'ProviderMileageCharge', 'ProviderChargesTotal', 'IsVoid', 'IsLocked']
+
+DATA_HEADER = ['DataValueId', 'User', 'User ID', 'Type', 'Data', 'Data Date', 'Trial', 'Break Event Name',
+               'Comments', 'Start Date', 'End Date', 'ClientId', 'Target']
+
+# filler for the timesheet columns prepper never reads
+TIMESHEET_FILLER = {'ClientFirstName': 'Kyle', 'ClientLastName': 'Griffin',
+                    'ClientContactLabels': 'ABA Therapy ,Active client ,Cedar Park Patient',
+                    'ProviderFirstName': 'Whitney', 'ProviderLastName': 'Abraham',
+                    'ProviderContactLabels': 'BT ,Cedar Park Staff ,Hourly', 'AuthorizationId': 7771200,
+                    'AuthorizationResourceId': 38163902, 'ProcedureCodeId': 127245, 'ProcedureCode': 97153,
+                    'ProcedureCodeDescription': 'Adaptive Behavior Treatment by Protocol, BT',
+                    'CodeLabels': 'Billable ,Direct Therapy Code ,Insurance Billable ,New CPT 2019',
+                    'Location': '11: Office', 'DriveTimeMinutes': 0, 'Mileage': '0.00', 'BillingLabels': '',
+                    'ClientSignature': 0, 'ProviderSignature': 1, 'PayorId': 983098,
+                    'PayorName': 'P: Cigna: Cigna - TN', 'ProviderCharges': '0.00000000', 'RateProvider': '0.00',
+                    'RateProviderDriveHourly': '0.000', 'RateProviderDriveMileage': '0.000',
+                    'ProviderDriveCharge': '0.000000000', 'ProviderMileageCharge': '0.00000',
+                    'ProviderChargesTotal': '0.00000000', 'IsVoid': '', 'IsLocked': 1}
+
+
+def generate(clients=1, targets=1, phases=3, years=1, timesheet_rows_per_day=3, attendance=0.8,
+             start='2019-01-07', seed=0):
+    """
+    synthetic CentralReach timesheets and data exports for a caseload
+
+    every target of a client shares the client's phase changes, so the targets of a client can be
+     charted side by side as data_* columns
+
+    :param clients: number of clients
+    :type clients: int
+
+    :param targets: number of targets per client
+    :type targets: int
+
+    :param phases: number of phase changes (Break Event Name rows) per target
+    :type phases: int
+
+    :param years: years of history
+    :type years: float
+
+    :param timesheet_rows_per_day: timesheet entries per client on every day with a session
+    :type timesheet_rows_per_day: int
+
+    :param attendance: share of days with a session
+    :type attendance: float
+
+    :param start: first day of the history
+    :type start: str
+
+    :param seed: seed of the random generator
+    :type seed: int
+
+    :return timesheets, data: timesheets export and data export of all clients, the data export has
+        ClientId and Target columns
+    :rtype timesheets, data: (pd.DataFrame, pd.DataFrame)
+    """
+    rng = np.random.default_rng(seed)
+    days = pd.date_range(start, periods=int(365 * years))
+
+    timesheets = []
+    data = []
+    for client in range(clients):
+        client_id = 850000 + client
+        session_days = days[rng.random(len(days)) < attendance]
+
+        ##############
+        # Timesheets #
+        ##############
+        session = np.repeat(session_days.values, timesheet_rows_per_day)
+        begin = pd.DatetimeIndex(session) + pd.to_timedelta(rng.integers(8 * 60, 15 * 60, len(session)), unit='m')
+        minutes = rng.integers(30, 180, len(session))
+        end = begin + pd.to_timedelta(minutes, unit='m')
+        sheet = pd.DataFrame({'Id': rng.integers(70000000, 80000000, len(session)),
+                              'DateOfService': begin.strftime('%m/%d/%Y %H:%M'),
+                              'DateTimeFrom': begin.strftime('%m/%d/%Y %H:%M'),
+                              'DateTimeTo': end.strftime('%m/%d/%Y %H:%M'),
+                              'ClientId': client_id,
+                              'ProviderId': rng.integers(600000, 1100000, len(session)),
+                              'TimeWorkedInMins': minutes,
+                              'TimeWorkedInHours': np.round(minutes / 60, 6),
+                              'UnitsOfService': minutes // 15})
+        for col, value in TIMESHEET_FILLER.items():
+            sheet[col] = value
+        timesheets.append(sheet[TIMESHEET_HEADER])
+
+        # phase changes are spread evenly over the history
+        change_days = days[np.linspace(0, len(days), phases + 2, dtype=int)[1:-1]]
+
+        ########
+        # Data #
+        ########
+        for target in range(targets):
+            name = f'target {target}'
+            level = rng.uniform(0.5, 3.)
+            trend = rng.normal(0., 0.002, phases + 1)[np.searchsorted(change_days, session_days, side='right')]
+            counts = rng.poisson(level * np.exp(np.cumsum(trend)) * timesheet_rows_per_day * 10) + 1
+            taken = session_days + pd.to_timedelta(rng.integers(8 * 60, 17 * 60, len(session_days)), unit='m')
+
+            summary = pd.DataFrame({'DataValueId': rng.integers(300000000, 700000000, len(session_days)),
+                                    'User': 'Jason Piglia',
+                                    'User ID': 874986,
+                                    'Type': 'intervention',
+                                    'Data': counts.astype(float),
+                                    'Data Date': taken.strftime('%m/%d/%Y %I:%M%p'),
+                                    'Trial': 'Summary',
+                                    'Break Event Name': name})
+            change = pd.DataFrame({'DataValueId': rng.integers(9000000, 13000000, phases),
+                                   'User': 'Taylor Schley',
+                                   'User ID': 1003078,
+                                   'Type': 'phase change',
+                                   'Data Date': change_days.strftime('%m/%d/%Y %I:%M%p'),
+                                   'Break Event Name': [f'phase {phase + 1}' for phase in range(phases)]})
+            change['Start Date'] = change['End Date'] = change['Data Date']
+            event = pd.DataFrame({'DataValueId': [9559880],
+                                  'User': 'Taylor Schley',
+                                  'User ID': 1003078,
+                                  'Type': 'event',
+                                  'Data Date': days[:1].strftime('%m/%d/%Y %I:%M%p'),
+                                  'Break Event Name': 'New Center'})
+
+            rows = pd.concat([summary, change, event], ignore_index=True, sort=False)
+            rows['ClientId'] = client_id
+            rows['Target'] = name
+            data.append(rows.reindex(columns=DATA_HEADER))
+
+    return pd.concat(timesheets, ignore_index=True), pd.concat(data, ignore_index=True)
+
+
+def write(out_dir, **kwargs):
+    """
+    write synthetic exports to out_dir/timesheets.csv and out_dir/data.csv
+
+    :param out_dir: directory to write to, created if missing
+    :type out_dir: str
+
+    :param kwargs: passed to generate
+
+    :return timesheets_path, data_path: paths of the written exports
+    :rtype timesheets_path, data_path: (str, str)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    timesheets, data = generate(**kwargs)
+    timesheets_path = os.path.join(out_dir, 'timesheets.csv')
+    data_path = os.path.join(out_dir, 'data.csv')
+    timesheets.to_csv(timesheets_path, index=False)
+    data.to_csv(data_path, index=False)
+    return timesheets_path, data_path
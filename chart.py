@@ -1,26 +1,49 @@
 import datetime
+import os
+import threading
 
 import matplotlib as mpl
 import matplotlib.dates as mdates
-import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
 import matplotlib.transforms as mtransforms
 import numpy as np
-import pandas as pd
-from matplotlib.dates import SU
+from matplotlib.artist import setp
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.colors import to_rgba
+from matplotlib.figure import Figure
+from matplotlib.image import imsave
+from matplotlib.lines import Line2D
 import re
 
-from chart_formatter import DataFormatter, DatePositionFormatter, TopFormatter
+from chart_formatter import DataFormatter, DatePositionFormatter, StepLocator, TopFormatter
+from profiling import stage
+
+# steps every chart and every page of a chart spans
+STEPS = 140
+
+# every chart spans 140 steps: days per step, the unit of a step, days per step of the top axis, its unit,
+#  how many top steps apart the top axis is labeled and the format of the dates over those labels
+CHART_TYPES = {'daily': {'step': 1., 'unit': 'DAYS', 'top_step': 7., 'top_unit': 'WEEKS',
+                         'top_labels': 4, 'date_format': '%m/%d/%Y'},
+               'weekly': {'step': 7., 'unit': 'WEEKS', 'top_step': 30.4375, 'top_unit': 'MONTHS',
+                          'top_labels': 6, 'date_format': '%m/%d/%Y'},
+               'monthly': {'step': 30.4375, 'unit': 'MONTHS', 'top_step': 365.25, 'top_unit': 'YEARS',
+                           'top_labels': 2, 'date_format': '%m/%Y'},
+               'yearly': {'step': 365.25, 'unit': 'YEARS', 'top_step': 3652.5, 'top_unit': 'DECADES',
+                          'top_labels': 3, 'date_format': '%Y'}}
 
 
 class SCC:
 
     def __init__(self, data, colors=dict(), markers=dict(),
                  phase_lines=dict(),
-                 figsize=(11, 9), ylim=(0.0005, 1000)):   # FEATURE GH-5 chart based on ratio not size in inches
+                 figsize=(11, 9), ylim=(0.0005, 1000),    # FEATURE GH-5 chart based on ratio not size in inches
+                 template=None, collections=False, chart='daily'):
         """
 
-        :param data: DataFrame containing the data to be charted with a DateTimeIndex.
+        :param data: DataFrame containing the data to be charted with a DateTimeIndex, the Pyramid of it or a
+            prepper.series.Series of which the data_* and counting columns are charted
         :type data: pd.DataFrame
 
         :param colors: Column to color pairs for plotting.
@@ -37,20 +60,56 @@ class SCC:
 
         :param ylim: size of the limit on the y-axis.
         :type ylim: tuple
+
+        :param template: shared chart scaffolding to draw onto instead of a new figure, figsize and ylim
+            are taken from the template
+        :type template: ChartTemplate
+
+        :param collections: draw all series, counting times and phase lines as a few batched collections
+            instead of one artist per column and phase line, faster for charts with many of them. The output
+            is not pixel-identical to the default: the markers are a scatter, placed at their exact position
+            where Line2D snaps them to whole pixels, so every marker may shift by up to a pixel, and all lines
+            are drawn before all markers
+        :type collections: bool
+
+        :param chart: chart type, 'daily', 'weekly', 'monthly' or 'yearly', taken from the template if given
+        :type chart: str
         """
-        self.data = data.copy()
+        self.template = template
+        self.__chart = None
+        self.__layers = None        # artists of the data layers, None until plotted
+        self.__lines = dict()       # artists of the data series, moved onto new data by update()
+        self.__columns = None       # columns of the data layers
+        self.__background = None    # data area without the lines once update() blits
+        self.__draw_event = None
+        self.__page = None          # page of the chart shown, None shows every step from the start
+        self.chart = template.chart if template is not None else chart
+        self.data = data
         self.colors = colors
         self.markers = markers
         self.phase_lines = phase_lines
+        self.collections = collections
         # setup figure and axes
-        self.fig, self.ax_data = plt.subplots(figsize=figsize)
-        self.ax_counting = self.ax_data.twinx()
-        self.ax_top = self.ax_data.twiny()
-        # figure attributes
-        self.ylim = ylim
+        if template is None:
+            # a figure of its own that pyplot never holds on to, see close()
+            self.fig = Figure(figsize=figsize)
+            FigureCanvasAgg(self.fig)
+            self.ax_data = self.fig.add_subplot(111)
+            self.ax_counting = self.ax_data.twinx()
+            self.ax_top = self.ax_data.twiny()
+            # figure attributes
+            self.ylim = ylim
+        else:
+            self.fig = template.fig
+            self.ax_data, self.ax_counting, self.ax_top = template.ax_data, template.ax_counting, template.ax_top
+            self.ylim = template.ylim
 
         # class wide absolutes
-        self.fontproperties = self.ax_data.xaxis.get_label().get_fontproperties()
+        # a copy, formatting the axes enlarges the label's own font and redrawn phase lines would follow it
+        if template is None:
+            self.fontproperties = self.ax_data.xaxis.get_label().get_fontproperties().copy()
+        else:
+            self.fontproperties = template.fontproperties.copy()
         self.ticklabelpad = mpl.rcParams['xtick.major.pad']
 
     @property
@@ -59,19 +118,114 @@ class SCC:
 
     @data.setter
     def data(self, df):
-        # errors with df
-        if not isinstance(df, pd.DataFrame):
-            raise TypeError('SCC.data must be a pandas.DataFrame')
-        elif not isinstance(df.index, pd.DatetimeIndex):
-            raise TypeError('SCC.data.index must be a pandas.DataTimeIndex')
-        elif df.eq(0).any().any():
-            raise ValueError('SCC.data cannot contain zeros.')
+        """
+        data is aggregated once into a Pyramid, SCC.data is the level of the chart type from the first
+         week down
+        """
+        from prepper.pyramid import Pyramid
+
+        self.__page = None
+        if isinstance(df, Pyramid):
+            self.pyramid = df
+            self.__select()
+            return
+        df = _validate(df)
 
-        df = df.copy()
-        self.start_date = df.index[0] - datetime.timedelta(days=df.index[0].weekday() + 1)
-        df.loc[self.start_date] = 0.0
-        df.sort_index(inplace=True)
-        self.__data = df.resample('D').sum().replace(0.0, np.nan)
+        with stage('SCC.data.resample', rows=len(df)):
+            self.pyramid = Pyramid(df.sort_index())
+            self.__select()
+
+    @property
+    def chart(self):
+        return self.__chart
+
+    @chart.setter
+    def chart(self, value):
+        """
+        chart type, switching it takes the data of the new type from the Pyramid without resampling
+
+        :param value: 'daily', 'weekly', 'monthly' or 'yearly'
+        :type value: str
+        """
+        if value not in CHART_TYPES:
+            raise ValueError(f'SCC.chart must be one of {", ".join(CHART_TYPES)}.')
+        if self.template is not None and value != self.template.chart:
+            raise ValueError('SCC.chart must be the chart type of SCC.template.')
+
+        self.__chart = value
+        self.__page = None
+        if getattr(self, 'pyramid', None) is not None:
+            self.__select()
+
+    @property
+    def phase_lines(self):
+        return self.__phase_lines
+
+    @phase_lines.setter
+    def phase_lines(self, value):
+        """
+        phase lines, kept along with their dates in date order so the lines of a page are found by bisection
+
+        :param value: Data to name for putting in phase_lines
+        :type value: dict
+        """
+        import pandas as pd
+
+        self.__phase_lines = dict(value)
+        dates = pd.to_datetime(list(self.__phase_lines)).values
+        order = np.argsort(dates, kind='stable')
+        self.__phase_dates = dates[order]
+        items = list(self.__phase_lines.items())
+        self.__phase_items = [items[i] for i in order]
+
+    @property
+    def page_count(self):
+        """
+        number of pages of STEPS steps the data spans
+        """
+        return -(-len(self.__steps) // STEPS)
+
+    def page(self, k):
+        """
+        show page k, the STEPS steps from the start of the chart plus k times STEPS, with the phase lines
+         that fall on it. The page is a slice of the data held, nothing is resampled, a plotted chart is
+         redrawn
+
+        :param k: page from 0 to page_count - 1, negative counts from the last page, None shows every step
+            from the start again
+        :type k: int
+
+        :return scc: the chart, e.g. scc.page(2).render_to('page_3.png')
+        :rtype scc: SCC
+        """
+        self.__page = None if k is None else range(self.page_count)[k]
+        self.__show_page()
+        if self.__layers is not None:
+            self.__columns = None   # the phase lines of the page differ, draw the data layers again
+            self.update()
+        return self
+
+    def pages(self):
+        """
+        show every page in turn, each is only sliced and drawn once the loop gets to it
+
+        :return pages: generator yielding the chart once on every page
+        :rtype pages: generator
+        """
+        for k in range(self.page_count):
+            yield self.page(k)
+
+    def page_dates(self, k):
+        """
+        :param k: page, negative counts from the last page
+        :type k: int
+
+        :return start, end: first day of page k and first day after it, e.g. to slice the stats of the page
+            with stats.loc[start:end]
+        :rtype start, end: (pd.Timestamp, pd.Timestamp)
+        """
+        start = self.__steps.index[range(self.page_count)[k] * STEPS]
+        return start, start + datetime.timedelta(days=STEPS * CHART_TYPES[self.chart]['step'])
 
     @property
     def colors(self):
@@ -84,6 +238,7 @@ class SCC:
         :param value: Column to color pairs for plotting.
         :type value: dict
         """
+        value = dict(value)     # never fill in defaults on the caller's dict, or the shared default argument
         diff = [column for column in self.data.columns if column not in value.keys()]
         for item in diff:
             value[item] = 'black'
@@ -103,6 +258,7 @@ class SCC:
         :param value: Column to marker pairs for plotting.
         :type value: dict
         """
+        value = dict(value)     # never fill in defaults on the caller's dict, or the shared default argument
         for k, v in value.items():
             if v == 'accel':
                 value[k] = '.'
@@ -116,26 +272,346 @@ class SCC:
 
         self.__markers = value
 
+    def append(self, rows, redraw=True):
+        """
+        add rows to the chart without resampling what it already holds, only the weeks, months and years
+         the rows fall in are summed up again, rows of a day already on the chart replace that day
+
+        :param rows: rows indexed by date with columns of SCC.data, or a prepper.series.Series
+        :type rows: pd.DataFrame
+
+        :param redraw: call update() once the rows are in, if the chart has been plotted
+        :type redraw: bool
+        """
+        rows = _validate(rows)
+        if set(rows.columns) - set(self.pyramid.columns):
+            raise ValueError('SCC.append rows must only have columns of SCC.data.')
+        if rows.empty:
+            return
+
+        with stage('SCC.append', rows=len(rows)):
+            self.pyramid.update(rows)
+            self.__select()
+        if redraw and self.__layers is not None:
+            self.update()
+
+    def update(self):
+        """
+        redraw the chart after its data changed, e.g. by append(), without rebuilding the figure
+
+        the lines and collections of the series are moved onto the new data and only the data area is
+         redrawn, blitted over a background of the chart without them on canvases that support it. The data
+         layers are only drawn again when the columns changed, the dates only when the chart start moved.
+        """
+        if self.__layers is None or not self.__on_template():
+            self.plot(show=False)
+            return
+
+        with stage('SCC.update', rows=len(self.data)):
+            moved = self.start_date != self.__start_date
+            if moved:
+                self.__start_date = self.start_date
+                if self.template is None:
+                    _set_dates(self.ax_data, self.ax_top, self.__week_labels, self.start_date, self.chart)
+                else:
+                    self.template.set_dates(self.start_date)
+
+            if list(self.data.columns) != self.__columns:
+                if self.template is not None:
+                    self.template.clear()
+                else:
+                    for artist in self.__layers:
+                        artist.remove()
+                self.__plot_data()
+                moved = True
+            elif self.collections:
+                self.__move_collections()
+            else:
+                for col, line in self.__lines.items():
+                    line.set_data(self.data.index, self.data[col].values)
+
+            if self.template is not None:
+                return      # templates are only drawn when saved
+            if moved:
+                self.fig.canvas.draw_idle()
+            else:
+                self.__blit()
+
     def set_data(self, data, colors, markers):
         self.data = data
         self.colors = colors
         self.markers = markers
 
-    def plot(self):
+    def plot(self, show=True):
+        """
+        plot the data, phase lines and chart formatting onto the figure
+
+        :param show: whether to call show() once the chart is drawn
+        :type show: bool
+        """
+        self.__check_open('plot')
+        if self.template is not None:
+            self.template.clear()   # drop the data layers of the previous chart drawn on the template
+
+        self.__plot_data()
+        self.__start_date = self.start_date
+
+        with stage('SCC.plot.format'):
+            if self.template is None:
+                self.__format_fig()
+            else:
+                self.template.set_dates(self.start_date)
+        if show:
+            self.show()
+
+    def show(self):
+        """
+        display the chart, inline under an inline backend such as a notebook's and otherwise in a pyplot
+         window that is closed again once pyplot.show() returns
+        """
+        self.__check_open('show')
+        if 'inline' in mpl.get_backend():
+            # pyplot only shows the figures it manages, hand this one to IPython itself
+            from IPython.display import display
+            display(self.fig)
+            return
+
+        import matplotlib.pyplot as plt
+        # lend the figure to a new pyplot window for as long as it is shown
+        manager = plt.figure(figsize=self.fig.get_size_inches(), dpi=self.fig.dpi).canvas.manager
+        manager.canvas.figure = self.fig
+        self.fig.set_canvas(manager.canvas)
+        try:
+            plt.show()
+        finally:
+            plt.close(self.fig)
+            FigureCanvasAgg(self.fig)
+
+    def geometry(self, stats=None):
+        """
+        what the chart (or its page) shows as plain arrays, for drawing it without matplotlib, see geometry.py
+
+        :param stats: output of prepper.stats.stats for the data, its celeration and bounce lines are taken
+            from the first and last row of every phase on the chart
+        :type stats: pd.DataFrame
+
+        :return geometry: dict with chart, start_date (np.datetime64), columns, days (int32 day of every step
+            with data from start_date), values (float32 log10 values, steps by columns, NaN where a column has
+            none), phase_lines (day, label) and lines, a dict per column and phase with column (index into
+            columns), start and end days, celeration, up_bounce and down_bounce as log10 (start, end) pairs,
+            cel_value and bounce_value
+        :rtype geometry: dict
+        """
+        import pandas as pd
+
+        start = np.datetime64(self.start_date, 'D')
+
+        def day(date):
+            return int((np.datetime64(pd.Timestamp(date), 'D') - start).astype(int))
+
+        data = self.data.dropna(how='all')
+        with np.errstate(divide='ignore'):
+            values = np.log10(data.values.astype(np.float32))
+
+        lines = []
+        if stats is not None:
+            # rows of the stats on the chart
+            end = self.data.index[-1] + datetime.timedelta(days=1)
+            if self.__page is not None:
+                end = self.page_dates(self.__page)[1]
+            rows = stats.iloc[stats.index.searchsorted(self.start_date):stats.index.searchsorted(end)]
+
+            phase = rows['phase'].values
+            edges = np.flatnonzero(np.r_[True, phase[1:] != phase[:-1], True])
+            for i, col in enumerate(data.columns):
+                name = col[len('data_'):]
+                if not col.startswith('data_') or f'celeration_{name}' not in rows:
+                    continue
+                for lo, hi in zip(edges[:-1], edges[1:]):
+                    first, last = rows.iloc[lo], rows.iloc[hi - 1]
+                    if pd.isna(first[f'celeration_{name}']):
+                        continue    # no phase, no stats
+                    line = {'column': i, 'start': day(first.name), 'end': day(last.name),
+                            'cel_value': first[f'cel_value_{name}'], 'bounce_value': first[f'bounce_value_{name}']}
+                    for kind in ('celeration', 'up_bounce', 'down_bounce'):
+                        line[kind] = (np.log10(first[f'{kind}_{name}']), np.log10(last[f'{kind}_{name}']))
+                    lines.append(line)
+
+        return {'chart': self.chart,
+                'start_date': start,
+                'columns': list(data.columns),
+                'days': (data.index.values.astype('datetime64[D]') - start).astype(np.int32),
+                'values': values,
+                'phase_lines': [(day(date), str(label)) for date, label in self.__page_phase_lines().items()],
+                'lines': lines}
+
+    def export(self, target, name='', stats=None):
+        """
+        write the geometry of the chart as one record of a geometry file, see geometry.py
+
+        :param target: path or binary file-like object of a new geometry file, or the GeometryWriter of a file
+            shared by many charts
+        :type target: str
+
+        :param name: name of the record, e.g. the client
+        :type name: str
+
+        :param stats: output of prepper.stats.stats for the data, see geometry()
+        :type stats: pd.DataFrame
+        """
+        from geometry import GeometryWriter
+
+        if isinstance(target, GeometryWriter):
+            target.write(name, self.geometry(stats))
+            return
+        with GeometryWriter(target) as writer:
+            writer.write(name, self.geometry(stats))
+
+    def render_to(self, target, **kwargs):
+        """
+        plot the chart if it has not been plotted yet, or another chart has drawn on its template since, and
+         write it out
+
+        :param target: path or file-like object, e.g. io.BytesIO, format is inferred from the extension
+        :type target: str
+
+        :param kwargs: passed through to save, e.g. format='png'
+
+        :return target: target
+        :rtype target: str
+        """
+        if self.__layers is None:
+            self.plot(show=False)
+        self.save(target, **kwargs)
+        return target
+
+    def close(self):
+        """
+        let go of the figure, a chart on a template only takes its own data layers off the template, and only
+         while no other chart has drawn on it since. Closing twice does nothing, plotting, showing or saving
+         the chart after raises ValueError
+        """
+        if self.fig is None:
+            return
+        self.__stop_blitting()
+        if self.template is None:
+            self.fig.clf()
+        elif self.__layers is not None and self.template.owner is self:
+            for artist in self.__layers:
+                artist.remove()
+            self.template.owner = None
+        self.fig = self.ax_data = self.ax_counting = self.ax_top = None
+        self.__layers = None
+        self.__lines = dict()
+
+    def __on_template(self):
+        # whether the data layers of the chart are the ones on its template, always true without a template
+        return self.template is None or self.template.owner is self
+
+    def __check_open(self, method):
+        if self.fig is None:
+            raise ValueError(f'SCC.{method} on a closed chart, make a new SCC to draw it again.')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def save(self, fname, **kwargs):
+        """
+        write the figure to disk, plot() must be called first. A chart on a template is plotted whenever
+         another chart has drawn on the template since
+
+        :param fname: path or file-like object to write to, format is inferred from the extension
+        :type fname: str
+
+        :param kwargs: passed through to Figure.savefig
+        """
+        self.__check_open('save')
+        if not self.__on_template():
+            self.plot(show=False)
+        # matplotlib lays out ticks and annotations while drawing, so that cost shows up here
+        with stage('SCC.save'):
+            if self.template is None:
+                self.fig.savefig(fname, **kwargs)
+            else:
+                self.template.save(fname, **kwargs)
+
+    def __plot_data(self):
+        # everything added to the axes from here on is a data layer
+        axes = (self.ax_data, self.ax_counting)
+        held = [set(ax.get_children()) for ax in axes]
+        self.__lines = dict()
+        self.__columns = list(self.data.columns)
+        self.__stop_blitting()
+
+        with stage('SCC.plot.layers', rows=len(self.data)):
+            if self.collections:
+                self.__plot_collections()
+            else:
+                self.__plot_layers()
+
+        self.__layers = [artist for ax, static in zip(axes, held) for artist in ax.get_children()
+                         if artist not in static]
+        if self.template is not None:
+            self.template.owner = self
+
+    def __blit(self):
+        canvas = self.fig.canvas
+        if not hasattr(canvas, 'copy_from_bbox'):
+            canvas.draw_idle()
+            return
+
+        if self.__background is None:
+            # from now on only blitting draws the lines, every full draw takes a new background without them
+            for line in self.__lines.values():
+                line.set_animated(True)
+            self.__draw_event = canvas.mpl_connect('draw_event', self.__on_draw)
+            canvas.draw()
+            return
+
+        canvas.restore_region(self.__background)
+        self.__draw_lines()
+        canvas.blit(self.ax_data.bbox)
+        canvas.flush_events()
+
+    def __on_draw(self, event):
+        if self.fig.canvas.is_saving():
+            return      # saving draws the lines itself and at its own dpi
+        self.__background = self.fig.canvas.copy_from_bbox(self.ax_data.bbox)
+        self.__draw_lines()
+
+    def __draw_lines(self):
+        for line in self.__lines.values():
+            line.axes.draw_artist(line)
+
+    def __stop_blitting(self):
+        if self.__draw_event is not None:
+            self.fig.canvas.mpl_disconnect(self.__draw_event)
+        self.__draw_event = None
+        self.__background = None
+
+    def __plot_layers(self):
+        import pandas as pd
+
         # plot data
         for col in self.data:
             if col == 'counting':
-                self.data.plot(y=col, ax=self.ax_counting,
-                               color=self.colors[col], marker='_',
-                               linestyle='None', legend=None)
+                self.__lines[col], = self.ax_counting.plot(self.data.index, self.data[col],
+                                                           color=self.colors[col], marker='_',
+                                                           linestyle='None')
             else:
-                self.data.plot(y=col, ax=self.ax_data,
-                               color=self.colors[col], marker=self.markers[col],
-                               linestyle='-', linewidth='1')
+                self.__lines[col], = self.ax_data.plot(self.data.index, self.data[col], label=col,
+                                                       color=self.colors[col], marker=self.markers[col],
+                                                       linestyle='-', linewidth='1')
+        if any(col != 'counting' for col in self.data):
+            self.ax_data.legend()
 
         # TODO plot celeration line
 
-        for date, label in self.phase_lines.items():
+        for date, label in self.__page_phase_lines().items():
+            date = pd.Timestamp(date)
             an = self.ax_data.annotate('',
                                        xy=(date, self.ylim[0]), xycoords='data',
                                        xytext=(date, self.ylim[1]), textcoords='data',
@@ -147,170 +623,451 @@ class SCC:
                                   rotation=-90, va='top',
                                   fontproperties=self.fontproperties)
 
-        self.__format_fig()
-        plt.show()
+    def __plot_collections(self):
+        import pandas as pd
+
+        # the same size and edge as Line2D markers, but not their snapping to whole pixels, see collections
+        size = mpl.rcParams['lines.markersize'] ** 2     # scatter sizes are squared marker sizes
+        edge = mpl.rcParams['lines.markeredgewidth']
+
+        segments, segment_colors, points, handles = self.__collect()
+        self.__lines['segments'] = self.ax_data.add_collection(
+            LineCollection(segments, colors=segment_colors, linewidths=1, zorder=2), autolim=False)
+        for (counting, marker), (x, y, colors) in points.items():
+            ax = self.ax_counting if counting else self.ax_data
+            self.__lines[counting, marker] = ax.scatter(x, y, s=size, c=colors, marker=marker, linewidths=edge,
+                                                        zorder=2)
+        if handles:
+            self.ax_data.legend(handles=handles)
+
+        phase_lines = self.__page_phase_lines()
+        if phase_lines:
+            dates = mdates.date2num([pd.Timestamp(date).to_pydatetime() for date in phase_lines])
+            # x in data, y in axes coordinates so the lines span the chart whatever the ylim
+            transform = mtransforms.blended_transform_factory(self.ax_data.transData, self.ax_data.transAxes)
+            self.ax_data.add_collection(LineCollection([[(date, 0.), (date, 1.)] for date in dates],
+                                                       colors='black', linewidths=mpl.rcParams['patch.linewidth'],
+                                                       transform=transform),
+                                        autolim=False)
+            pad = mtransforms.ScaledTranslation(0., -self.ticklabelpad / 72., self.fig.dpi_scale_trans)
+            for date, label in zip(dates, phase_lines.values()):
+                self.ax_data.text(date, 1., label, transform=transform + pad,
+                                  rotation=-90, va='top', fontproperties=self.fontproperties)
+
+    def __move_collections(self):
+        # the same collections onto the new data, so they keep their place in the draw order
+        segments, segment_colors, points, _ = self.__collect()
+        self.__lines['segments'].set_segments(segments)
+        self.__lines['segments'].set_color(segment_colors)
+        for key, (x, y, colors) in points.items():
+            self.__lines[key].set_offsets(np.column_stack([x, y]))
+            self.__lines[key].set_facecolor(colors)
+
+    def __collect(self):
+        x = mdates.date2num(self.data.index.to_pydatetime())
+
+        # one segment per run of days with data, the same gaps Axes.plot leaves at NaN
+        segments = []
+        segment_colors = []
+        points = dict()     # marker to x, y and colors of its points
+        handles = []
+        for col in self.data:
+            y = self.data[col].values
+            valid = ~np.isnan(y)
+            color = to_rgba(self.colors[col])
+            marker = '_' if col == 'counting' else self.markers[col]
+            xs, ys, colors = points.setdefault((col == 'counting', marker), ([], [], []))
+            xs.append(x[valid])
+            ys.append(y[valid])
+            colors += [color] * int(valid.sum())
+            if col == 'counting':
+                continue
+
+            edges = np.flatnonzero(np.diff(np.r_[0, valid.astype(int), 0]))
+            for start, end in zip(edges[::2], edges[1::2]):
+                if end - start > 1:
+                    segments.append(np.column_stack([x[start:end], y[start:end]]))
+                    segment_colors.append(color)
+            handles.append(Line2D([], [], label=col, color=color, marker=marker,
+                                  linestyle='-', linewidth=1))
+
+        points = {key: (np.concatenate(xs), np.concatenate(ys), np.array(colors).reshape(-1, 4))
+                  for key, (xs, ys, colors) in points.items()}
+        return segments, segment_colors, points, handles
+
+    def __select(self):
+        import pandas as pd
+        from prepper.pyramid import FREQUENCIES
+
+        data = self.pyramid.level(self.chart)
+        if self.chart == 'daily':
+            start_date = data.index[0] - datetime.timedelta(days=data.index[0].weekday() + 1)
+        else:
+            start_date = data.index[0]
+        # every step from the start on, missing steps are NaN so no line is drawn across them, so page k
+        #  is rows k * STEPS on
+        self.__steps = data.reindex(pd.date_range(start_date, data.index[-1], freq=FREQUENCIES[self.chart]))
+        if self.__page is not None and self.__page >= self.page_count:
+            self.__page = None
+        self.__show_page()
+
+    def __show_page(self):
+        if self.__page is None:
+            self.__data = self.__steps
+        else:
+            self.__data = self.__steps.iloc[self.__page * STEPS:(self.__page + 1) * STEPS]
+        self.start_date = self.__steps.index[0 if self.__page is None else self.__page * STEPS]
+
+    def __page_phase_lines(self):
+        if self.__page is None:
+            return self.phase_lines
+        start, end = self.page_dates(self.__page)
+        lo, hi = np.searchsorted(self.__phase_dates, [np.datetime64(start), np.datetime64(end)])
+        return dict(self.__phase_items[lo:hi])
 
     def __format_fig(self):
-        # set overall variables
-        self.ax_data.grid(b=True, which='both', axis='both')  # make grid visible
-        self.ax_data.set(xlabel='SUCCESSIVE CALENDAR DAYS',
-                         ylabel='COUNT PER MINUTE',
-                         yscale='log',
-                         ylim=self.ylim,
-                         zorder=1.0)  # set left y axis
-
-        # left y axis
-        self.ax_data.yaxis.label.set_color('#3498db')
-        self.ax_data.yaxis.set_major_locator(ticker.LogLocator(subs=(1.0, 0.5,)))  # set locator
-        self.ax_data.yaxis.set_major_formatter(DataFormatter())  # set formatter
-        self.ax_data.tick_params(axis='y',
-                                 which='major',
-                                 grid_linewidth=0.5,
-                                 grid_color='#3498db',
-                                 colors='#3498db')
-        self.ax_data.tick_params(axis='y',
-                                 which='minor',
-                                 grid_linewidth=0.25,
-                                 grid_color='#3498db',
-                                 colors='#3498db')
-
-        # bottom x axis
-        self.ax_data.xaxis.label.set_color('#3498db')
-        self.ax_data.xaxis.label.set_size('large')
-        self.ax_data.set_xlim(np.datetime64(self.start_date),
-                              np.datetime64(self.start_date + datetime.timedelta(days=140)))     # FEATURE GH-4 Scaling y-axis
-
-        # FEATURE GH-6 different types of charts
-        self.ax_data.xaxis.set_major_locator(mdates.WeekdayLocator(byweekday=SU))
-        self.ax_data.xaxis.set_minor_locator(mdates.DayLocator())
-
-        self.ax_data.xaxis.set_major_formatter(DatePositionFormatter())
-
-        self.ax_data.tick_params(axis='x', which='major',
-                                 labelsize='large',
-                                 labelrotation=0.,
-                                 grid_linewidth=0.5,
-                                 grid_color='#3498db',
-                                 colors='#3498db')
-        self.ax_data.tick_params(axis='x',
-                                 which='minor',
-                                 grid_linewidth=0.25,
-                                 grid_color='#3498db',
-                                 colors='#3498db')
-
-        for tick in self.ax_data.xaxis.get_major_ticks():
-            plt.setp(tick.label, ha='center')
-
-        # right y axis
-        self.ax_counting.set(yscale='log',
-                             ylim=self.ylim,
-                             zorder=2.0)
-
-        self.ax_counting.yaxis.set_major_locator(
-            ticker.FixedLocator([6, 4, 3, 2, 1, 0.5, 0.2, 0.1, 0.05, 0.02, 0.01, 0.005, 0.002, 0.001]))
-        self.ax_counting.yaxis.set_minor_locator(ticker.FixedLocator([(1 / 60),
-                                                                      (1 / (60 * 2)),
-                                                                      (1 / (60 * 4)),
-                                                                      (1 / (60 * 8)),
-                                                                      (1 / (60 * 16)),
-                                                                      (1 / (60 * 24))]))
-
-        major_labels = {6: '10" sec',
-                        4: '15"',
-                        3: '20"',
-                        2: '30"',
-                        1: "1' min",
-                        0.5: "2'",
-                        0.2: "5'",
-                        0.1: "10'",
-                        0.05: "20'",
-                        0.02: "50'",
-                        0.01: "100'",
-                        0.005: "200'",
-                        0.002: "500'",
-                        0.001: "1000'"}
-        minor_labels = {(1 / 60): '1\xB0 hr',
-                        (1 / (60 * 2)): '2\xB0',
-                        (1 / (60 * 4)): '4\xB0',
-                        (1 / (60 * 8)): '8\xB0',
-                        (1 / (60 * 16)): '16\xB0',
-                        (1 / (60 * 24)): '24\xB0'}
-        self.ax_counting.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, pos: major_labels.get(x)))
-        self.ax_counting.yaxis.set_minor_formatter(ticker.FuncFormatter(lambda x, pos: minor_labels.get(x)))
-
-        self.ax_counting.tick_params(axis='y',
-                                     which='major',
-                                     labelsize='small',
-                                     colors='#3498db')
-        self.ax_counting.tick_params(axis='y',
-                                     which='minor',
-                                     labelsize='small',
-                                     colors='#3498db')
-
-        offset = mtransforms.ScaledTranslation(35 / 72., 0 / 72., self.fig.dpi_scale_trans)
-        for element in self.ax_counting.yaxis.get_minorticklabels() + self.ax_counting.yaxis.get_minorticklines():
-            element.set_transform(element.get_transform() + offset)
-
-        label = self.ax_counting.get_ymajorticklabels()[0]
-        self.ax_counting.annotate('COUNTING TIMES',
-                                  xy=(0., 0.), xycoords=label,  # 'axes fraction',
-                                  xytext=(self.ticklabelpad, 30.), textcoords='offset points',
-                                  color='#3498db', size='small',
-                                  va='bottom', rotation=90.,
-                                  fontproperties=self.fontproperties)
+        self.__week_labels = _format_axes(self.fig, self.ax_data, self.ax_counting, self.ax_top, self.ylim,
+                                          self.start_date, self.fontproperties, self.ticklabelpad, self.chart)
+
+
+class ChartTemplate:
+    """
+    Chart scaffolding shared by every chart with the same figsize, ylim and chart type.
+
+    The grid, scales, counting times and week annotations are built once and rasterized, each chart then
+    only draws its data series, phase lines and week dates on top of the cached background. PNG output is
+    blitted from that background, any other format is a full draw of the shared figure.
+    """
+
+    # any Sunday works, tick positions relative to the axes are the same for every chart start date
+    start_date = datetime.datetime(1970, 1, 4)
+
+    def __init__(self, figsize=(11, 9), ylim=(0.0005, 1000), chart='daily'):
+        """
+        :param figsize: Size of the figure
+        :type figsize: tuple
+
+        :param ylim: size of the limit on the y-axis.
+        :type ylim: tuple
+
+        :param chart: chart type, 'daily', 'weekly', 'monthly' or 'yearly'
+        :type chart: str
+        """
+        if chart not in CHART_TYPES:
+            raise ValueError(f'ChartTemplate.chart must be one of {", ".join(CHART_TYPES)}.')
+        self.figsize = figsize
+        self.ylim = ylim
+        self.chart = chart
+        # setup figure and axes
+        self.fig = Figure(figsize=figsize)
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.ax_data = self.fig.add_subplot(111)
+        self.ax_counting = self.ax_data.twinx()
+        self.ax_top = self.ax_data.twiny()
+        self.owner = None       # chart whose data layers are on the template, set by SCC
+
+        # font of the labels before formatting, charts on the template copy it for their phase lines
+        self.fontproperties = self.ax_data.xaxis.get_label().get_fontproperties().copy()
+
+        with stage('ChartTemplate.build'):
+            fontproperties = self.ax_data.xaxis.get_label().get_fontproperties()
+            ticklabelpad = mpl.rcParams['xtick.major.pad']
+            self.week_labels = _format_axes(self.fig, self.ax_data, self.ax_counting, self.ax_top,
+                                            self.ylim, self.start_date, fontproperties, ticklabelpad, chart)
+            self.__static = [(ax, set(ax.get_children())) for ax in (self.ax_data, self.ax_counting, self.ax_top)]
+
+            # rasterize everything but the week dates, they change with every chart
+            for _, label in self.week_labels:
+                label.set_visible(False)
+            self.canvas.draw()
+            self.__background = self.canvas.copy_from_bbox(self.fig.bbox)
+            for _, label in self.week_labels:
+                label.set_visible(True)
+
+    def clear(self):
+        """
+        remove every artist added since the template was built
+        """
+        self.owner = None
+        for ax, static in self.__static:
+            for artist in ax.get_children():
+                if artist not in static:
+                    artist.remove()
+
+    def set_dates(self, start_date):
+        """
+        move the template to the 140 steps starting at start_date
+
+        :param start_date: first day of the chart
+        :type start_date: datetime.datetime
+        """
+        self.start_date = start_date
+        _set_dates(self.ax_data, self.ax_top, self.week_labels, start_date, self.chart)
+
+    def save(self, fname, **kwargs):
+        """
+        write the template with the current data layers to disk
+
+        :param fname: path or file-like object to write to, format is inferred from the extension
+        :type fname: str
+
+        :param kwargs: passed through to Figure.savefig, only a plain png is blitted
+        """
+        fmt = kwargs.get('format')
+        if fmt is None and isinstance(fname, str):
+            fmt = os.path.splitext(fname)[1][1:]
+        if (fmt or mpl.rcParams['savefig.format']).lower() != 'png' or set(kwargs) - {'format'}:
+            self.fig.savefig(fname, **kwargs)
+            return
+
+        renderer = self.canvas.get_renderer()
+        self.canvas.restore_region(self.__background)
+        for artist in self.__layers():
+            artist.draw(renderer)
+        imsave(fname, np.asarray(self.canvas.buffer_rgba()), format='png', dpi=self.fig.dpi)
+
+    def __layers(self):
+        layers = []
+        for ax, static in sorted(self.__static, key=lambda item: item[0].get_zorder()):
+            children = [artist for artist in ax.get_children() if artist not in static]
+            if ax is self.ax_top:
+                children += [label for _, label in self.week_labels]
+            layers += sorted(children, key=lambda artist: artist.get_zorder())
+        return layers
+
+
+# templates of every thread, charts rendered on different threads never share a figure
+_templates = threading.local()
+
+
+def get_template(figsize=(11, 9), ylim=(0.0005, 1000), chart='daily'):
+    """
+    get the cached ChartTemplate for figsize, ylim and chart type, building it on first use
+
+    :param figsize: Size of the figure
+    :type figsize: tuple
+
+    :param ylim: size of the limit on the y-axis.
+    :type ylim: tuple
+
+    :param chart: chart type, 'daily', 'weekly', 'monthly' or 'yearly'
+    :type chart: str
+
+    :return template: template shared by all charts of this thread with this figsize, ylim and chart type
+    :rtype template: ChartTemplate
+    """
+    templates = getattr(_templates, 'by_key', None)
+    if templates is None:
+        templates = _templates.by_key = dict()
+
+    key = (tuple(figsize), tuple(ylim), chart)
+    if key not in templates:
+        templates[key] = ChartTemplate(figsize=key[0], ylim=key[1], chart=chart)
+    return templates[key]
+
+
+def _validate(df):
+    # data of a chart as a DataFrame, raises on anything SCC cannot chart
+    import pandas as pd
+    from prepper.series import Series
+
+    if isinstance(df, Series):
+        # only what a chart plots, a series from combine_cr also holds counting_time in minutes
+        df = df.to_frame(phase=None, columns=[col for col in df.columns if col.startswith('data_') or
+                                              col == 'counting'])
+
+    # errors with df
+    if not isinstance(df, pd.DataFrame):
+        raise TypeError('SCC.data must be a pandas.DataFrame')
+    elif not isinstance(df.index, pd.DatetimeIndex):
+        raise TypeError('SCC.data.index must be a pandas.DataTimeIndex')
+    with stage('SCC.data.validate', rows=len(df)):
+        if df.eq(0).any().any():
+            raise ValueError('SCC.data cannot contain zeros.')
+    return df
+
+
+def _xlim(start_date, chart):
+    return (np.datetime64(start_date),
+            np.datetime64(start_date + datetime.timedelta(days=STEPS * CHART_TYPES[chart]['step'])))
+
+
+def _set_dates(ax_data, ax_top, week_labels, start_date, chart='daily'):
+    xlim = _xlim(start_date, chart)
+    ax_data.set_xlim(*xlim)
+    ax_top.set_xlim(*xlim)
+    for days, label in week_labels:
+        label.set_text((start_date + datetime.timedelta(days=days)).strftime(CHART_TYPES[chart]['date_format']))
+
+
+def _format_axes(fig, ax_data, ax_counting, ax_top, ylim, start_date, fontproperties, ticklabelpad, chart='daily'):
+    """
+    apply the Standard Celeration Chart grid, scales, ticks and annotations of a chart type to the axes
+
+    :return week_labels: (day offset, annotation) of the dates above every fourth week
+    :rtype week_labels: list
+    """
+    # set overall variables
+    ax_data.grid(b=True, which='both', axis='both')  # make grid visible
+    step, unit = CHART_TYPES[chart]['step'], CHART_TYPES[chart]['unit']
+    top_step, top_unit = CHART_TYPES[chart]['top_step'], CHART_TYPES[chart]['top_unit']
+    every = CHART_TYPES[chart]['top_labels']
+
+    ax_data.set(xlabel=f'SUCCESSIVE CALENDAR {unit}',
+                ylabel='COUNT PER MINUTE',
+                yscale='log',
+                ylim=ylim,
+                zorder=1.0)  # set left y axis
+
+    # left y axis
+    ax_data.yaxis.label.set_color('#3498db')
+    ax_data.yaxis.set_major_locator(ticker.LogLocator(subs=(1.0, 0.5,)))  # set locator
+    ax_data.yaxis.set_major_formatter(DataFormatter())  # set formatter
+    ax_data.tick_params(axis='y',
+                        which='major',
+                        grid_linewidth=0.5,
+                        grid_color='#3498db',
+                        colors='#3498db')
+    ax_data.tick_params(axis='y',
+                        which='minor',
+                        grid_linewidth=0.25,
+                        grid_color='#3498db',
+                        colors='#3498db')
+
+    # bottom x axis
+    ax_data.xaxis.label.set_color('#3498db')
+    ax_data.xaxis.label.set_size('large')
+    ax_data.set_xlim(*_xlim(start_date, chart))     # FEATURE GH-4 Scaling y-axis
+
+    # a line every step, a longer one every 7 steps
+    ax_data.xaxis.set_major_locator(StepLocator(7 * step))
+    ax_data.xaxis.set_minor_locator(StepLocator(step))
+
+    ax_data.xaxis.set_major_formatter(DatePositionFormatter())
+
+    ax_data.tick_params(axis='x', which='major',
+                        labelsize='large',
+                        labelrotation=0.,
+                        grid_linewidth=0.5,
+                        grid_color='#3498db',
+                        colors='#3498db')
+    ax_data.tick_params(axis='x',
+                        which='minor',
+                        grid_linewidth=0.25,
+                        grid_color='#3498db',
+                        colors='#3498db')
+
+    for tick in ax_data.xaxis.get_major_ticks():
+        setp(tick.label, ha='center')
+
+    # right y axis
+    ax_counting.set(yscale='log',
+                    ylim=ylim,
+                    zorder=2.0)
+
+    ax_counting.yaxis.set_major_locator(
+        ticker.FixedLocator([6, 4, 3, 2, 1, 0.5, 0.2, 0.1, 0.05, 0.02, 0.01, 0.005, 0.002, 0.001]))
+    ax_counting.yaxis.set_minor_locator(ticker.FixedLocator([(1 / 60),
+                                                             (1 / (60 * 2)),
+                                                             (1 / (60 * 4)),
+                                                             (1 / (60 * 8)),
+                                                             (1 / (60 * 16)),
+                                                             (1 / (60 * 24))]))
+
+    major_labels = {6: '10" sec',
+                    4: '15"',
+                    3: '20"',
+                    2: '30"',
+                    1: "1' min",
+                    0.5: "2'",
+                    0.2: "5'",
+                    0.1: "10'",
+                    0.05: "20'",
+                    0.02: "50'",
+                    0.01: "100'",
+                    0.005: "200'",
+                    0.002: "500'",
+                    0.001: "1000'"}
+    minor_labels = {(1 / 60): '1\xB0 hr',
+                    (1 / (60 * 2)): '2\xB0',
+                    (1 / (60 * 4)): '4\xB0',
+                    (1 / (60 * 8)): '8\xB0',
+                    (1 / (60 * 16)): '16\xB0',
+                    (1 / (60 * 24)): '24\xB0'}
+    ax_counting.yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, pos: major_labels.get(x)))
+    ax_counting.yaxis.set_minor_formatter(ticker.FuncFormatter(lambda x, pos: minor_labels.get(x)))
+
+    ax_counting.tick_params(axis='y',
+                            which='major',
+                            labelsize='small',
+                            colors='#3498db')
+    ax_counting.tick_params(axis='y',
+                            which='minor',
+                            labelsize='small',
+                            colors='#3498db')
+
+    offset = mtransforms.ScaledTranslation(35 / 72., 0 / 72., fig.dpi_scale_trans)
+    for element in ax_counting.yaxis.get_minorticklabels() + ax_counting.yaxis.get_minorticklines():
+        element.set_transform(element.get_transform() + offset)
+
+    label = ax_counting.get_ymajorticklabels()[0]
+    ax_counting.annotate('COUNTING TIMES',
+                         xy=(0., 0.), xycoords=label,  # 'axes fraction',
+                         xytext=(ticklabelpad, 30.), textcoords='offset points',
+                         color='#3498db', size='small',
+                         va='bottom', rotation=90.,
+                         fontproperties=fontproperties)
+
+    # top x axis
+    ax_top.set_zorder(3.0)
+    ax_top.set_xlim(*_xlim(start_date, chart))
+
+    ax_top.xaxis.set_major_locator(StepLocator(top_step))
+    ax_top.xaxis.set_minor_locator(StepLocator(step))
+
+    ax_top.xaxis.set_major_formatter(TopFormatter(every))
+
+    ax_top.tick_params(axis='x', which='major',
+                       labelsize='large',
+                       colors='#3498db')
+    ax_top.tick_params(axis='x',
+                       which='minor',
+                       length=0.,
+                       colors='#3498db')
+
+    # title of the top axis next to its first three labels
+    words = {every: 'SUCCESSIVE', 2 * every: 'CALENDAR', 3 * every: top_unit}
+
+    week_labels = []
+    x0, x1 = ax_top.get_xlim()
+    for pos, x in enumerate(ax_top.get_xticks()):
+        if pos % every == 0:
+            days = int(np.ceil(x - x0 - 1e-6))     # first whole day on or after the tick
+            x = (x - x0) / (x1 - x0)
+            if pos in words:
+                ax_top.annotate(words[pos],
+                                xy=(x, 1), xycoords='axes fraction',
+                                xytext=(25, ticklabelpad + 10), textcoords='offset points',
+                                va='center', size='large', color='#3498db',
+                                fontproperties=fontproperties)
+
+            an = ax_top.annotate('',
+                                 xy=(x, 1), xycoords='axes fraction',
+                                 xytext=(ticklabelpad + 60, 40), textcoords='offset points',
+                                 arrowprops=dict(arrowstyle='-', shrinkB=25,
+                                                 color='#3498db',
+                                                 connectionstyle="angle,angleA=0,angleB=90"), )
+            date = (start_date + datetime.timedelta(days=days)).strftime(CHART_TYPES[chart]['date_format'])
+            week_label = ax_top.annotate(date,
+                                         xy=(1., 1.), xycoords=an,
+                                         xytext=(-ticklabelpad, 1.), textcoords='offset points',
+                                         ha='right', va='bottom', size='medium',
+                                         fontproperties=fontproperties)
+            week_labels.append((days, week_label))
+
+    # set frame color
+    for ax, color in zip([ax_data, ax_counting, ax_top], ['#3498db', '#3498db', '#3498db', '#3498db']):
+        setp(ax.spines.values(), color=color)
+        setp([ax.get_xticklines(), ax.get_yticklines()], color=color)
 
-        # top x axis
-        self.ax_top.set_zorder(3.0)
-        self.ax_top.set_xlim(np.datetime64(self.start_date),
-                             np.datetime64(self.start_date + datetime.timedelta(days=140)))
-
-        self.ax_top.xaxis.set_major_locator(mdates.WeekdayLocator(byweekday=SU))
-        self.ax_top.xaxis.set_minor_locator(mdates.DayLocator())
-
-        self.ax_top.xaxis.set_major_formatter(TopFormatter())
-
-        self.ax_top.tick_params(axis='x', which='major',
-                                labelsize='large',
-                                colors='#3498db')
-        self.ax_top.tick_params(axis='x',
-                                which='minor',
-                                length=0.,
-                                colors='#3498db')
-
-        for pos, x in enumerate(self.ax_top.get_xticks()):
-            if pos % 4 == 0:
-                if pos == 4:
-                    self.ax_top.annotate('SUCCESSIVE',
-                                         xy=(x, 1), xycoords=('data', 'axes fraction'),
-                                         xytext=(25, self.ticklabelpad + 10), textcoords='offset points',
-                                         va='center', size='large', color='#3498db',
-                                         fontproperties=self.fontproperties)
-                elif pos == 8:
-                    self.ax_top.annotate('CALENDAR',
-                                         xy=(x, 1), xycoords=('data', 'axes fraction'),
-                                         xytext=(25, self.ticklabelpad + 10), textcoords='offset points',
-                                         va='center', size='large', color='#3498db',
-                                         fontproperties=self.fontproperties)
-                elif pos == 12:
-                    self.ax_top.annotate('WEEKS',
-                                         xy=(x, 1), xycoords=('data', 'axes fraction'),
-                                         xytext=(25, self.ticklabelpad + 10), textcoords='offset points',
-                                         va='center', size='large', color='#3498db',
-                                         fontproperties=self.fontproperties)
-
-                an = self.ax_top.annotate('',
-                                          xy=(x, 1), xycoords=('data', 'axes fraction'),
-                                          xytext=(self.ticklabelpad + 60, 40), textcoords='offset points',
-                                          arrowprops=dict(arrowstyle='-', shrinkB=25,
-                                                          color='#3498db',
-                                                          connectionstyle="angle,angleA=0,angleB=90"), )
-                self.ax_top.annotate(mdates.num2date(x).strftime('%m/%d/%Y'),
-                                     xy=(1., 1.), xycoords=an,
-                                     xytext=(-self.ticklabelpad, 1.), textcoords='offset points',
-                                     ha='right', va='bottom', size='medium',
-                                     fontproperties=self.fontproperties)
-
-        # set frame color
-        for ax, color in zip([self.ax_data, self.ax_counting, self.ax_top], ['#3498db', '#3498db', '#3498db', '#3498db']):
-            plt.setp(ax.spines.values(), color=color)
-            plt.setp([ax.get_xticklines(), ax.get_yticklines()], color=color)
+    return week_labels
@@ -1,3 +1,4 @@
+import numpy as np
 from matplotlib import ticker
 from matplotlib.dates import num2date, SEC_PER_DAY
 
@@ -44,10 +45,30 @@ class DataFormatter(ticker.Formatter):
 
 class TopFormatter(ticker.Formatter):
 
+    def __init__(self, every=4):
+        self.every = every
+
     def __call__(self, x, pos=None):
-        if pos % 4 == 0:
+        if pos % self.every == 0:
             return pos
         return None
 
     def format_data(self, value):
         return num2date(value).strftime('%Y-%m-%d')
+
+
+class StepLocator(ticker.Locator):
+    """
+    ticks every step days from the start of the view, the chart grid is evenly spaced and does not follow
+     the calendar, a month is 30.4375 days and a year 365.25
+    """
+
+    def __init__(self, step):
+        self.step = step
+
+    def __call__(self):
+        vmin, vmax = self.axis.get_view_interval()
+        return self.tick_values(vmin, vmax)
+
+    def tick_values(self, vmin, vmax):
+        return vmin + np.arange(int(np.floor((vmax - vmin) / self.step + 1e-9)) + 1) * self.step
@@ -0,0 +1,208 @@
+import argparse
+import json
+import struct
+import sys
+import traceback
+
+import numpy as np
+
+#################
+# File layout   #
+#################
+# little endian, str is a uint16 byte length and utf-8, a file is a header and then one record per chart
+#
+# header  b'SCCG', uint16 VERSION
+# record  uint32 bytes of the record after this field, so readers can skip records
+#         str name
+#         uint8 chart type, index into CHART_TYPES
+#         int32 start_date, days since 1970-01-01
+#         uint8 columns, str name of every column
+#         uint32 steps, int32 day of every step from start_date, float32 log10 values, steps by columns
+#         uint16 phase lines, int32 day and str label of every phase line
+#         uint16 lines, every line uint8 column, int32 start and end day, float32 celeration, up_bounce and
+#             down_bounce at start and end (log10), str cel_value, str bounce_value
+
+MAGIC = b'SCCG'
+VERSION = 1
+
+# chart types in the order of their codes
+CHART_TYPES = ('daily', 'weekly', 'monthly', 'yearly')
+
+
+class GeometryWriter:
+    """
+    Writes the geometry of many charts into one file, see SCC.geometry and SCC.export.
+
+    Every chart is one record written out as soon as it is given, so a caseload streams through in the
+    memory of a single chart.
+    """
+
+    def __init__(self, target):
+        """
+        :param target: path or binary file-like object to write to
+        :type target: str
+        """
+        self.__owned = isinstance(target, str)
+        self.file = open(target, 'wb') if self.__owned else target
+        self.count = 0
+        self.file.write(MAGIC + struct.pack('<H', VERSION))
+
+    def write(self, name, geometry):
+        """
+        :param name: name of the record, e.g. the client
+        :type name: str
+
+        :param geometry: geometry of a chart as given by SCC.geometry
+        :type geometry: dict
+        """
+        days = np.asarray(geometry['days'], dtype='<i4')
+        values = np.asarray(geometry['values'], dtype='<f4').reshape(len(days), len(geometry['columns']))
+
+        parts = [_pack_str(name),
+                 struct.pack('<Bi', CHART_TYPES.index(geometry['chart']),
+                             int(geometry['start_date'].astype('datetime64[D]').astype(int))),
+                 struct.pack('<B', len(geometry['columns']))]
+        parts += [_pack_str(col) for col in geometry['columns']]
+        parts += [struct.pack('<I', len(days)), days.tobytes(), values.tobytes()]
+
+        parts.append(struct.pack('<H', len(geometry['phase_lines'])))
+        for day, label in geometry['phase_lines']:
+            parts += [struct.pack('<i', day), _pack_str(label)]
+
+        parts.append(struct.pack('<H', len(geometry['lines'])))
+        for line in geometry['lines']:
+            parts += [struct.pack('<Bii6f', line['column'], line['start'], line['end'],
+                                  *line['celeration'], *line['up_bounce'], *line['down_bounce']),
+                      _pack_str(line['cel_value']), _pack_str(line['bounce_value'])]
+
+        record = b''.join(parts)
+        self.file.write(struct.pack('<I', len(record)) + record)
+        self.count += 1
+
+    def close(self):
+        """
+        flush the file, a file opened from a path is closed
+        """
+        if self.__owned:
+            self.file.close()
+        else:
+            self.file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def read_geometry(source):
+    """
+    read a geometry file back one record at a time
+
+    :param source: path or binary file-like object to read from
+    :type source: str
+
+    :return records: generator of (name, geometry) with geometry laid out as given by SCC.geometry
+    :rtype records: generator
+    """
+    f = open(source, 'rb') if isinstance(source, str) else source
+    try:
+        magic, version = f.read(4), struct.unpack('<H', f.read(2))[0]
+        if magic != MAGIC:
+            raise ValueError('not a chart geometry file')
+        if version != VERSION:
+            raise ValueError(f'chart geometry version {version} is not supported, expected {VERSION}')
+
+        while True:
+            size = f.read(4)
+            if not size:
+                return
+            yield _unpack_record(memoryview(f.read(struct.unpack('<I', size)[0])))
+    finally:
+        if isinstance(source, str):
+            f.close()
+
+
+def _pack_str(value):
+    data = str(value).encode('utf-8')
+    return struct.pack('<H', len(data)) + data
+
+
+def _unpack_record(record):
+    offset = 0
+
+    def take(fmt):
+        nonlocal offset
+        values = struct.unpack_from(fmt, record, offset)
+        offset += struct.calcsize(fmt)
+        return values
+
+    def take_str():
+        nonlocal offset
+        size, = take('<H')
+        offset += size
+        return bytes(record[offset - size:offset]).decode('utf-8')
+
+    name = take_str()
+    chart, start = take('<Bi')
+    columns = [take_str() for _ in range(take('<B')[0])]
+    steps, = take('<I')
+    days = np.frombuffer(record, dtype='<i4', count=steps, offset=offset)
+    offset += days.nbytes
+    values = np.frombuffer(record, dtype='<f4', count=steps * len(columns), offset=offset).reshape(steps, len(columns))
+    offset += values.nbytes
+
+    phase_lines = [(take('<i')[0], take_str()) for _ in range(take('<H')[0])]
+    lines = []
+    for _ in range(take('<H')[0]):
+        column, line_start, end, *ends = take('<Bii6f')
+        lines.append({'column': column, 'start': line_start, 'end': end,
+                      'celeration': tuple(ends[0:2]), 'up_bounce': tuple(ends[2:4]), 'down_bounce': tuple(ends[4:6]),
+                      'cel_value': take_str(), 'bounce_value': take_str()})
+
+    return name, {'chart': CHART_TYPES[chart],
+                  'start_date': np.datetime64(start, 'D'),
+                  'columns': columns,
+                  'days': days,
+                  'values': values,
+                  'phase_lines': phase_lines,
+                  'lines': lines}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export the geometry of many Standard Celeration Charts to one file.')
+    parser.add_argument('manifest',
+                        help='json file holding a list of chart jobs, job data is a path to a prepared csv and '
+                             'job stats optionally a path to a csv of its stats')
+    parser.add_argument('out', help='path the geometry file is written to')
+    args = parser.parse_args(argv)
+
+    import pandas as pd
+    from chart import SCC, get_template
+
+    with open(args.manifest) as f:
+        jobs = json.load(f)
+
+    failed = 0
+    with GeometryWriter(args.out) as writer:
+        for i, job in enumerate(jobs):
+            name = job.get('name', f'chart_{i}')
+            try:
+                stats = job.get('stats')
+                if stats is not None:
+                    stats = pd.read_csv(stats, index_col=0, parse_dates=True)
+                # on the shared template, a chart that is only exported never needs a figure of its own
+                with SCC(pd.read_csv(job['data'], index_col=0, parse_dates=True),
+                         phase_lines=job.get('phase_lines', {}),
+                         template=get_template(chart=job.get('chart', 'daily'))) as scc:
+                    scc.export(writer, name=name, stats=stats)
+            except Exception:
+                print(f'{name} failed:\n{traceback.format_exc()}', file=sys.stderr)
+                failed += 1
+
+    print(f'exported {len(jobs) - failed} of {len(jobs)} charts to {args.out}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,197 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import matplotlib as mpl
+
+# stages in the order every job passes them, each on a process pool of its own, combine reads the exports
+STAGES = ('combine', 'stats', 'render')
+
+# jobs of a stage in flight at once
+CONCURRENCY = {'combine': 2, 'stats': 2, 'render': os.cpu_count() or 1}
+
+# workers start from a fresh interpreter, forking while the event loop and the other pools run threads can
+# hand a worker a lock some thread held at the time of the fork
+_CONTEXT = multiprocessing.get_context('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods()
+                                       else 'spawn')
+
+PipelineResult = namedtuple('PipelineResult', ['name', 'paths', 'error'])
+Progress = namedtuple('Progress', ['stage', 'name', 'seconds', 'error'])
+
+
+async def run_pipeline(jobs, out_dir, concurrency=None, queue_size=2, formats=('png',), progress=None):
+    """
+    prepare, compute stats for and chart a caseload of CentralReach exports with the stages overlapping,
+     while one job is rendered the next ones are already being combined and summarized
+
+    every stage takes jobs from a bounded queue, so a stage that falls behind holds back the ones before
+     it instead of piling up frames in memory, a failing job is reported and leaves the pipeline. Workers
+     are handed paths and read the exports in chunks themselves, no raw export is ever sent between processes
+
+    :param jobs: chart jobs, each a dict with 'name', 'timesheets_path' and 'data_path' and optionally
+        'colors', 'markers', 'phase_lines', 'figsize', 'ylim', 'collections', 'chart' as passed to SCC
+    :type jobs: list
+
+    :param out_dir: directory <name>.stats.csv and <name>.<format> of every job are written to
+    :type out_dir: str
+
+    :param concurrency: stage name to number of jobs of that stage in flight, defaults to CONCURRENCY
+    :type concurrency: dict
+
+    :param queue_size: jobs waiting in front of every stage at most
+    :type queue_size: int
+
+    :param formats: file formats to write per chart
+    :type formats: tuple
+
+    :param progress: called with a Progress every time a job finishes a stage
+    :type progress: callable
+
+    :return results: one PipelineResult per job in the order the jobs were given
+    :rtype results: list
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    concurrency = dict(CONCURRENCY, **(concurrency or {}))
+    jobs = list(jobs)
+    results = [None] * len(jobs)
+    loop = asyncio.get_running_loop()
+
+    # a pool per stage so only the render workers import matplotlib and build chart templates
+    executors = {name: ProcessPoolExecutor(max_workers=concurrency[name], mp_context=_CONTEXT,
+                                           initializer=_init_worker)
+                 for name in STAGES}
+    try:
+        stages = [('combine', executors['combine'], _combine),
+                  ('stats', executors['stats'], partial(_stats, out_dir=out_dir)),
+                  ('render', executors['render'], partial(_render, out_dir=out_dir, formats=tuple(formats)))]
+        queues = [asyncio.Queue(maxsize=queue_size) for _ in stages]    # queue in front of every stage
+
+        async def feed():
+            for i, job in enumerate(jobs):
+                await queues[0].put((i, job.get('name', f'chart_{i}'), job, None, []))
+            for _ in range(concurrency[STAGES[0]]):
+                await queues[0].put(None)
+
+        async def work(k):
+            name, executor, func = stages[k]
+            while True:
+                item = await queues[k].get()
+                if item is None:
+                    return
+                i, chart, job, value, paths = item
+
+                start = time.perf_counter()
+                try:
+                    output, written = await loop.run_in_executor(executor, func, chart, job, value)
+                    error = None
+                except Exception:
+                    error = traceback.format_exc()
+                if progress is not None:
+                    progress(Progress(name, chart, time.perf_counter() - start, error))
+
+                if error is not None:
+                    results[i] = PipelineResult(chart, paths, error)
+                elif k + 1 == len(stages):
+                    results[i] = PipelineResult(chart, paths + written, None)
+                else:
+                    # stages that only write files hand None on, the job keeps its value
+                    await queues[k + 1].put((i, chart, job, value if output is None else output, paths + written))
+
+        async def run(k):
+            await asyncio.gather(*[work(k) for _ in range(concurrency[stages[k][0]])])
+            if k + 1 < len(stages):
+                for _ in range(concurrency[stages[k + 1][0]]):
+                    await queues[k + 1].put(None)
+
+        await asyncio.gather(feed(), *[run(k) for k in range(len(stages))])
+    finally:
+        for executor in executors.values():
+            executor.shutdown()
+
+    return results
+
+
+def pipeline(jobs, out_dir, concurrency=None, queue_size=2, formats=('png',), progress=None):
+    """
+    run_pipeline on its own event loop, see run_pipeline for the parameters
+
+    :return results: one PipelineResult per job in the order the jobs were given
+    :rtype results: list
+    """
+    return asyncio.run(run_pipeline(jobs, out_dir, concurrency=concurrency, queue_size=queue_size,
+                                    formats=formats, progress=progress))
+
+
+def _init_worker():
+    # workers never display anything, force a headless backend
+    mpl.use('Agg')
+
+
+def _combine(name, job, value):
+    from prepper.combine import combine_cr_files
+    return combine_cr_files(job['timesheets_path'], job['data_path']), []
+
+
+def _stats(name, job, combined, out_dir):
+    from prepper.stats import stats
+    path = os.path.join(out_dir, f'{name}.stats.csv')
+    stats(combined).to_csv(path)
+    return None, [path]
+
+
+def _render(name, job, combined, out_dir, formats):
+    from render import write_job
+    data = combined[[col for col in combined.columns if col.startswith('data_')] + ['counting']]
+    return None, write_job(name, dict(job, data=data), out_dir, formats)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Prepare and chart a caseload of CentralReach exports.')
+    parser.add_argument('manifest', help='json file holding a list of chart jobs with timesheets_path and data_path')
+    parser.add_argument('out_dir', help='directory the stats and charts are written to')
+    parser.add_argument('-c', '--concurrency', action='append', default=[], metavar='STAGE=N',
+                        help='jobs of a stage in flight at once, may be given more than once, '
+                             f'stages: {", ".join(STAGES)}')
+    parser.add_argument('-q', '--queue-size', type=int, default=2, help='jobs waiting in front of every stage')
+    parser.add_argument('-f', '--format', dest='formats', action='append', choices=['png', 'svg'],
+                        help='output format, may be given more than once (default: png)')
+    parser.add_argument('--quiet', action='store_true', help='do not report every finished stage')
+    args = parser.parse_args(argv)
+
+    concurrency = dict()
+    for value in args.concurrency:
+        name, _, count = value.partition('=')
+        if name not in STAGES or not count.isdigit() or int(count) < 1:
+            parser.error(f'--concurrency must be STAGE=N with a stage of {", ".join(STAGES)} and N >= 1')
+        concurrency[name] = int(count)
+
+    with open(args.manifest) as f:
+        jobs = json.load(f)
+
+    def report(event):
+        print(f'{event.stage:<8} {event.name} {event.seconds:.2f} s{" failed" if event.error else ""}',
+              file=sys.stderr)
+
+    start = time.perf_counter()
+    results = pipeline(jobs, args.out_dir, concurrency=concurrency, queue_size=args.queue_size,
+                       formats=args.formats or ('png',), progress=None if args.quiet else report)
+
+    failed = [result for result in results if result.error is not None]
+    for result in failed:
+        print(f'{result.name} failed:\n{result.error}', file=sys.stderr)
+    print(f'prepared {len(results) - len(failed)} of {len(results)} charts to {args.out_dir} '
+          f'in {time.perf_counter() - start:.1f} s')
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from prepper.combine import combine_cr_files
+from prepper.stats import stats
+
+# bump whenever combine or stats change their output so stale cache entries are never read
+PIPELINE_VERSION = '2'
+
+try:
+    import pyarrow  # noqa: F401 feather needs pyarrow
+    DEFAULT_FORMAT = 'feather'
+except ImportError:
+    DEFAULT_FORMAT = 'pickle'
+
+
+def prepare_cr(timesheets_path, data_path, cache_dir='.pyscc_cache', max_bytes=1 << 30):
+    """
+    combine_cr_files and stats of a pair of CentralReach exports, served from the on disk cache
+     when the exports have not changed since they were last prepared
+
+    :param timesheets_path: path to the timesheets export
+    :type timesheets_path: str
+
+    :param data_path: path to the data export of the target - must be count only data
+    :type data_path: str
+
+    :param cache_dir: directory of the cache
+    :type cache_dir: str
+
+    :param max_bytes: size the cache is evicted down to
+    :type max_bytes: int
+
+    :return combined, data: output of combine_cr_files and of stats
+    :rtype combined, data: (pd.DataFrame, pd.DataFrame)
+    """
+    cache = PipelineCache(cache_dir, max_bytes=max_bytes)
+    key = cache.key(timesheets_path, data_path)
+
+    frames = cache.get(key)
+    if frames is None:
+        combined = combine_cr_files(timesheets_path, data_path)
+        frames = {'combined': combined, 'stats': stats(combined)}
+        cache.put(key, frames)
+
+    return frames['combined'], frames['stats']
+
+
+class PipelineCache:
+    """
+    On disk cache of prepared DataFrames keyed by a hash of the source exports and PIPELINE_VERSION.
+
+    Every entry is a directory holding one feather (or pickle, without pyarrow) file per frame. Entries
+    are evicted least recently used first once the cache grows past max_bytes. Content hashes of the
+    exports are remembered by path, size and modification time so unchanged files are not read again.
+    """
+
+    def __init__(self, directory, max_bytes=1 << 30, format=None):
+        """
+        :param directory: directory of the cache, created if missing
+        :type directory: str
+
+        :param max_bytes: size the cache is evicted down to
+        :type max_bytes: int
+
+        :param format: 'feather' or 'pickle', defaults to feather when pyarrow is installed
+        :type format: str
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.format = format or DEFAULT_FORMAT
+        if self.format not in ('feather', 'pickle'):
+            raise ValueError('PipelineCache.format must be either feather or pickle.')
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, *paths, **params):
+        """
+        cache key of a set of input files and pipeline parameters
+
+        :param paths: input files
+        :type paths: str
+
+        :param params: anything else the output depends on, must be json serializable
+        :return key: hex digest
+        :rtype key: str
+        """
+        digest = hashlib.sha256(PIPELINE_VERSION.encode())
+        for path in paths:
+            digest.update(self.__file_hash(path).encode())
+        digest.update(json.dumps(params, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        """
+        :param key: cache key
+        :type key: str
+
+        :return frames: name to DataFrame pairs stored under key, None when not cached
+        :rtype frames: dict
+        """
+        entry = os.path.join(self.directory, key)
+        try:
+            with open(os.path.join(entry, 'meta.json')) as f:
+                meta = json.load(f)
+            frames = {name: self.__read(os.path.join(entry, name), meta['format'], index)
+                      for name, index in meta['frames'].items()}
+        except (OSError, ValueError, KeyError):
+            return None
+
+        os.utime(os.path.join(entry, 'meta.json'))    # mark as recently used
+        return frames
+
+    def put(self, key, frames):
+        """
+        store frames under key and evict down to max_bytes
+
+        :param key: cache key
+        :type key: str
+
+        :param frames: name to DataFrame pairs
+        :type frames: dict
+        """
+        entry = os.path.join(self.directory, key)
+        partial = f'{entry}.{os.getpid()}.tmp'
+        shutil.rmtree(partial, ignore_errors=True)
+        os.makedirs(partial)
+
+        meta = {'format': self.format, 'version': PIPELINE_VERSION, 'frames': dict()}
+        for name, frame in frames.items():
+            meta['frames'][name] = self.__write(os.path.join(partial, name), frame)
+        with open(os.path.join(partial, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+        # swap the finished entry in so readers never see half of one
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(partial, entry)
+        self.evict()
+
+    def evict(self):
+        """
+        remove least recently used entries until the cache fits in max_bytes
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            entry = os.path.join(self.directory, name)
+            meta = os.path.join(entry, 'meta.json')
+            if not os.path.isfile(meta):
+                continue
+            size = sum(os.path.getsize(os.path.join(entry, file)) for file in os.listdir(entry))
+            entries.append((os.path.getmtime(meta), size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def __file_hash(self, path):
+        index_path = os.path.join(self.directory, 'files.json')
+        try:
+            with open(index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = dict()
+
+        stat = os.stat(path)
+        name = os.path.abspath(path)
+        known = index.get(name)
+        if known is not None and known['size'] == stat.st_size and known['mtime'] == stat.st_mtime_ns:
+            return known['hash']
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+
+        index[name] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'hash': digest.hexdigest()}
+        with open(index_path, 'w') as f:
+            json.dump(index, f)
+        return index[name]['hash']
+
+    def __write(self, path, frame):
+        index = [name if name is not None else f'level_{i}' for i, name in enumerate(frame.index.names)]
+        if self.format == 'pickle':
+            frame.to_pickle(f'{path}.pkl')
+        else:
+            frame.rename_axis(index).reset_index().to_feather(f'{path}.feather')
+        return {'names': list(frame.index.names), 'columns': index}
+
+    @staticmethod
+    def __read(path, format, index):
+        if format == 'pickle':
+            return pd.read_pickle(f'{path}.pkl')
+
+        frame = pd.read_feather(f'{path}.feather').set_index(index['columns'])
+        frame.index.names = index['names']
+        # feather hands missing values in object columns back as None
+        for col in frame.columns[frame.dtypes == object]:
+            frame[col] = frame[col].where(frame[col].notna(), np.nan)
+        return frame
@@ -1,7 +1,19 @@
+import numpy as np
 import pandas as pd
 
+from prepper.series import Series
+from profiling import stage
 
-def combine_cr(raw_timesheets, raw_data):
+# date formats of the CentralReach exports
+TIMESHEET_DATE_FORMAT = '%m/%d/%Y %H:%M'
+DATA_DATE_FORMAT = '%m/%d/%Y %I:%M%p'
+
+# the only columns combine_cr needs out of the exports and their dtypes
+TIMESHEET_COLUMNS = {'DateOfService': str, 'TimeWorkedInMins': float}
+DATA_COLUMNS = {'Type': str, 'Data': float, 'Data Date': str, 'Trial': str, 'Break Event Name': str}
+
+
+def combine_cr(raw_timesheets, raw_data, compact=False):
     """
     data prepper for for CentralReach count only data
 
@@ -11,91 +23,280 @@ def combine_cr(raw_timesheets, raw_data):
     :param raw_data: raw_data from target - must be count only data
     :type raw_data: pd.Dataframe
 
+    :param compact: return a compact prepper.series.Series instead of a Dataframe
+    :type compact: bool
+
     :return data: Dataframe indexed by date, columns: data (count/minute), counting_time, phase
     :rtype data: pd.Dataframe
     """
+    data = _combine(timesheet_totals(raw_timesheets),
+                    phase_changes(raw_data),
+                    daily_data(raw_data))
+    return Series.from_frame(data) if compact else data
+
+
+def combine_cr_files(timesheets_path, data_path, chunksize=100000, compact=False):
+    """
+    combine_cr straight from the CentralReach csv exports, reading them in chunks so only the needed
+     columns and one chunk of rows are ever in memory
+
+    :param timesheets_path: path to the timesheets export
+    :type timesheets_path: str
+
+    :param data_path: path to the data export of the target - must be count only data
+    :type data_path: str
+
+    :param chunksize: number of csv rows read at a time
+    :type chunksize: int
+
+    :param compact: return a compact prepper.series.Series instead of a Dataframe
+    :type compact: bool
+
+    :return data: Dataframe indexed by date, columns: data (count/minute), counting_time, phase
+    :rtype data: pd.Dataframe
+    """
+    data, phase_change = read_data(data_path, chunksize=chunksize)
+    data = _combine(read_timesheets(timesheets_path, chunksize=chunksize),
+                    phase_change,
+                    data)
+    return Series.from_frame(data) if compact else data
+
+
+def combine_all(raw_timesheets, raw_data, target='Target'):
+    """
+    data prepper for CentralReach count only data of every client and every target in one grouped pass,
+     the timesheets are totaled once per client and day and joined to all targets in a single merge
+
+    :param raw_timesheets: timesheets from CR of all clients, only direct therapy hours
+    :type raw_timesheets: pd.Dataframe
+
+    :param raw_data: raw_data of all clients and targets with a ClientId and a target column - must be count only data
+    :type raw_data: pd.Dataframe
+
+    :param target: column of raw_data naming the target
+    :type target: str
+
+    :return data: Dataframe indexed by ClientId, target and date, columns: data (count/minute), counting_time, phase
+    :rtype data: pd.Dataframe
+    """
+    keys = ['ClientId', target]
+
+    timesheets = timesheet_totals(raw_timesheets, by=['ClientId']).reset_index()
+    phase_change = phase_changes(raw_data, by=keys).reset_index().rename(columns={'date': 'phase_date'})
+    data = daily_data(raw_data, by=keys).reset_index()
+
+    ###############
+    # Combine all #
+    ###############
+
+    with stage('combine.merge', rows=len(data)):
+        # merge counting times and data
+        data = data.merge(timesheets, on=['ClientId', 'date'])
+
+        # put in phase column, the phase of a day is the last phase change on or before it
+        data = pd.merge_asof(data.sort_values('date'), phase_change.sort_values('phase_date'),
+                             left_on='date', right_on='phase_date', by=keys)
+        data.loc[data.phase_date.isna(), 'phase'] = 'intervention'
+
+    #############################
+    # Convert data to count/min #
+    #############################
+    data['data_decel'] = data.data_decel / data.counting_time
+    data['counting'] = 1 / data.counting_time
+
+    data = data.set_index(keys + ['date']).sort_index()
+    return data[['data_decel', 'counting_time', 'phase', 'counting']].dropna()
+
+
+def read_timesheets(path, chunksize=100000):
+    """
+    stream a timesheets export and total the counting time per day
+
+    :param path: path to the timesheets export
+    :type path: str
+
+    :param chunksize: number of csv rows read at a time
+    :type chunksize: int
+
+    :return timesheets: Dataframe indexed by date, columns: counting_time
+    :rtype timesheets: pd.Dataframe
+    """
+    timesheets = None
+    for chunk in _read_csv(path, TIMESHEET_COLUMNS, chunksize):
+        totals = timesheet_totals(chunk)
+        timesheets = totals if timesheets is None else timesheets.add(totals, fill_value=0)
+
+    return timesheets.sort_index()
+
+
+def read_data(path, chunksize=100000):
+    """
+    stream a data export of a target, total the data per day and collect the phase changes
+
+    :param path: path to the data export of the target - must be count only data
+    :type path: str
+
+    :param chunksize: number of csv rows read at a time
+    :type chunksize: int
+
+    :return data, phase_change: Dataframe indexed by date, columns: data_decel
+        and Dataframe indexed by date, columns: phase
+    :rtype data, phase_change: (pd.Dataframe, pd.Dataframe)
+    """
+    data = None
+    phase_change = []
+    in_phase_changes = True     # phase changes are the rows without a trial up to the first event
+    for chunk in _read_csv(path, DATA_COLUMNS, chunksize):
+        totals = daily_data(chunk)
+        data = totals if data is None else data.add(totals, fill_value=0)
+
+        if in_phase_changes:
+            rows = chunk[chunk.Trial.isna()]
+            events = np.flatnonzero(rows.Type.values == 'event')
+            if len(events):
+                rows = rows.iloc[0:events[0]]
+                in_phase_changes = False
+            phase_change.append(rows)
+
+    return data.sort_index(), phase_changes(pd.concat(phase_change), until_event=False)
 
-    # TODO assume zero for no data
 
-    ##############
-    # Timesheets #
-    ##############
+def timesheet_totals(raw_timesheets, by=()):
+    """
+    total counting time per day of a timesheets export
+
+    :param raw_timesheets: timesheets from CR that contain the date range of interest and only direct therapy hours
+    :type raw_timesheets: pd.Dataframe
+
+    :param by: columns to total separately for, e.g. ClientId, they are put in front of date in the index
+    :type by: list
+
+    :return timesheets: Dataframe indexed by date, columns: counting_time
+    :rtype timesheets: pd.Dataframe
+    """
+    by = list(by)
 
     # filter to only the rows we need
-    timesheets = raw_timesheets[['DateOfService', 'TimeWorkedInMins']].rename(
+    timesheets = raw_timesheets[by + ['DateOfService', 'TimeWorkedInMins']].rename(
         columns={'DateOfService': 'date', 'TimeWorkedInMins': 'counting_time'}
     )
 
-    drop_time(timesheets)   # drop time from date column
+    timesheets['date'] = parse_date(timesheets.date, TIMESHEET_DATE_FORMAT)    # drop time from date column
+
+    with stage('combine.timesheet_totals', rows=len(timesheets)):
+        return timesheets.groupby(by + ['date']).sum().sort_index()    # combine all counting times by date
 
-    timesheets = timesheets.groupby(['date']).sum()     # combine all counting times by date
 
-    timesheets.date = pd.to_datetime(timesheets.index,
-                                     infer_datetime_format=True)    # convert to datetime
-    timesheets.sort_index(inplace=True)
-    # print(f'timesheets:\n{timesheets}')
+def phase_changes(raw_data, until_event=True, by=()):
+    """
+    phase changes of a data export
 
-    ################
-    # Phase Change #
-    ################
+    :param raw_data: raw_data from target
+    :type raw_data: pd.Dataframe
+
+    :param until_event: only keep the rows without a trial before the first event, False when raw_data
+        already holds only the phase change rows
+    :type until_event: bool
+
+    :param by: columns identifying a target, e.g. ClientId, each target has its own phase changes and first event
+    :type by: list
+
+    :return phase_change: Dataframe indexed by date, columns: phase
+    :rtype phase_change: pd.Dataframe
+    """
+    by = list(by)
 
     # filter for phase change
     phase_change = raw_data[raw_data.Trial.isna()]
-    phase_change.reset_index(inplace=True)
-    phase_change = phase_change.iloc[0:phase_change[phase_change.Type == 'event'].index[0]]
-    phase_change = phase_change[['Data Date', 'Break Event Name']].rename(
+    if until_event:
+        events = phase_change.Type == 'event'
+        events = events.groupby([phase_change[col] for col in by]).cumsum() if by else events.cumsum()
+        phase_change = phase_change[events == 0]
+    phase_change = phase_change[by + ['Data Date', 'Break Event Name']].rename(
         columns={'Data Date': 'date', 'Break Event Name': 'phase'}
     )
 
-    drop_time(phase_change)     # drop time from date column
-    phase_change.set_index('date', inplace=True)    # set index to date
-    phase_change.index = pd.to_datetime(phase_change.index,
-                                        infer_datetime_format=True)     # convert to datetime
-    phase_change.sort_index(inplace=True)
-    # print(f'phase_change:\n{phase_change}')
+    phase_change['date'] = parse_date(phase_change.date, DATA_DATE_FORMAT)     # drop time from date column
+    phase_change.set_index(by + ['date'], inplace=True)    # set index to date
 
-    ####################
-    # Convert Raw Data #
-    ####################
+    return phase_change.sort_index()
+
+
+def daily_data(raw_data, by=()):
+    """
+    total data per day of a data export
+
+    :param raw_data: raw_data from target - must be count only data
+    :type raw_data: pd.Dataframe
+
+    :param by: columns to total separately for, e.g. ClientId, they are put in front of date in the index
+    :type by: list
+
+    :return data: Dataframe indexed by date, columns: data_decel
+    :rtype data: pd.Dataframe
+    """
+    by = list(by)
 
     # filter for only data
-    data = raw_data[raw_data.Trial == 'Summary'][['Data Date', 'Data']].rename(
+    data = raw_data[raw_data.Trial == 'Summary'][by + ['Data Date', 'Data']].rename(
         columns={'Data Date': 'date', 'Data': 'data_decel'}
     )
 
-    drop_time(data)     # drop time from date column
-    data = data.groupby(['date']).sum()     # combine data by date
-    data.index = pd.to_datetime(data.index,
-                                infer_datetime_format=True)     # convert to datetime
-    data.sort_index(inplace=True)
-    # print(f'data:\n{data}')
+    data['date'] = parse_date(data.date, DATA_DATE_FORMAT)     # drop time from date column
+
+    with stage('combine.daily_data', rows=len(data)):
+        return data.groupby(by + ['date']).sum().sort_index()  # combine data by date
+
 
+def parse_date(dates, date_format):
+    """
+    parse export date strings with a known format and drop the time of day
+
+    :param dates: date strings
+    :type dates: pd.Series
+
+    :param date_format: strftime format of the strings
+    :type date_format: str
+
+    :return dates: dates at midnight
+    :rtype dates: pd.Series
+    """
+    with stage('combine.parse_date', rows=len(dates)):
+        return pd.to_datetime(dates, format=date_format).dt.normalize()
+
+
+def _read_csv(path, columns, chunksize):
+    reader = pd.read_csv(path, usecols=list(columns), dtype=columns, chunksize=chunksize)
+    while True:
+        with stage('combine.read_csv') as timing:
+            chunk = next(reader, None)
+            timing.rows = 0 if chunk is None else len(chunk)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def _combine(timesheets, phase_change, data):
     ###############
     # Combine all #
     ###############
 
-    # merge counting times and data
-    data = data.merge(timesheets,
-                      left_index=True,
-                      right_index=True)
-    # print(f'data & timesheets:\n{data}')
+    with stage('combine.merge', rows=len(data)):
+        # merge counting times and data
+        data = data.merge(timesheets,
+                          left_index=True,
+                          right_index=True)
 
-    # put in phase column
-    idx = pd.date_range(data.index[0], data.index[-1])
-    phase_change = phase_change.reindex(idx, method='pad', fill_value='intervention')
+        # put in phase column
+        idx = pd.date_range(data.index[0], data.index[-1])
+        phase_change = phase_change.reindex(idx, method='pad', fill_value='intervention')
 
-    data = data.merge(phase_change, how='right', left_index=True, right_index=True)
-    # print(f'data+timesheets & phase_change:\n{data}')
+        data = data.merge(phase_change, how='right', left_index=True, right_index=True)
 
     #############################
     # Convert data to count/min #
     #############################
-    data['data_decel'] = data.apply(lambda x: x['data_decel']/x.counting_time, axis=1)
-    data['counting'] = data.apply(lambda x: 1/x.counting_time, axis=1)
+    data['data_decel'] = data.data_decel / data.counting_time
+    data['counting'] = 1 / data.counting_time
 
     return data.dropna()
-
-
-def drop_time(df):
-    df.date = df.date.str.split(" ", n=1, expand=True)[0]
-    return df
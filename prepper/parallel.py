@@ -0,0 +1,135 @@
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from prepper.stats import fit_blocks, fit_labels
+from profiling import stage
+
+# per row outputs of fit_blocks and per block outputs, in the order they are laid out in the shared files
+ROW_OUTPUTS = ('celeration', 'up_bounce', 'down_bounce')
+BLOCK_OUTPUTS = ('slope', 'intercept', 'up', 'down')
+
+
+def stats_all(data, workers=None, chunks_per_worker=4, directory=None):
+    """
+    within condition statistics (celeration and bounce lines and values) of every client and target of a
+     caseload across all cores
+
+    the log10 rates and the phase blocks of all series are packed once into memory mapped files every worker
+     maps, each worker fits a run of whole phase blocks and writes its results back into shared output files,
+     so no frame is pickled to or from the workers
+
+    :param data: data indexed by the series keys and date, e.g. ClientId, target and date as returned by
+        combine_all, with a phase column and data_* columns, rows of a series in date order
+    :type data: pd.DataFrame
+
+    :param workers: number of worker processes, defaults to the number of cpus, 1 fits in this process
+    :type workers: int
+
+    :param chunks_per_worker: runs of phase blocks handed to every worker, more balance uneven series better
+    :type chunks_per_worker: int
+
+    :param directory: directory of the shared files, e.g. /dev/shm, defaults to the system temp directory
+    :type directory: str
+
+    :return data: copy of data with celeration_*, cel_value_*, up_bounce_*, down_bounce_* and bounce_value_*
+        columns, every series gets the same stats as batch_within_condition_stats gives it on its own
+    :rtype data: pd.DataFrame
+    """
+    data = data.copy()
+
+    # filter columns to iterate over only columns containing data
+    r = re.compile('data_*')
+    columns = list(filter(r.match, data.columns))
+
+    with stage('stats_all.pack', rows=len(data)):
+        # a block is one phase of one series, rows without a phase get no stats
+        keys = data.index.droplevel(-1) if data.index.nlevels > 1 else np.zeros(len(data), dtype=int)
+        series, _ = pd.factorize(keys)
+        phases, phase_names = pd.factorize(data['phase'])
+        codes, _ = pd.factorize(np.where(phases >= 0, series * (len(phase_names) + 1) + phases, -1))
+        codes[phases < 0] = -1
+
+        rows = np.flatnonzero(codes >= 0)
+        if not columns or not len(rows):
+            return data
+
+        # sort rows by block so every block is a contiguous run
+        order = rows[np.argsort(codes[rows], kind='stable')]
+        codes = codes[order]
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        sizes = np.diff(np.r_[starts, len(order)])
+
+    workers = workers or os.cpu_count() or 1
+    with tempfile.TemporaryDirectory(dir=directory) as shared:
+        paths = {name: os.path.join(shared, f'{name}.f8') for name in ('Y', 'rows', 'blocks')}
+        shape = (len(order), len(columns))
+
+        Y = np.memmap(paths['Y'], dtype=float, mode='w+', shape=shape)
+        Y[:] = np.log10(data[columns].values[order].astype(float))
+        Y.flush()
+        del Y
+        np.memmap(paths['rows'], dtype=float, mode='w+', shape=(len(ROW_OUTPUTS),) + shape).flush()
+        np.memmap(paths['blocks'], dtype=float, mode='w+',
+                  shape=(len(BLOCK_OUTPUTS), len(starts), len(columns))).flush()
+
+        # runs of whole blocks with about the same number of rows each
+        bounds = np.searchsorted(starts, np.linspace(0, len(order), workers * chunks_per_worker + 1)[1:-1])
+        bounds = np.unique(np.r_[0, bounds, len(starts)])
+        chunks = [(paths, shape, len(starts), lo, hi, starts[lo:hi], sizes[lo:hi])
+                  for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+        with stage('stats_all.fit', rows=len(order)):
+            if workers == 1 or len(chunks) == 1:
+                for chunk in chunks:
+                    _fit_chunk(*chunk)
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    for _ in executor.map(_fit_chunk, *zip(*chunks)):
+                        pass
+
+        outputs = np.array(np.memmap(paths['rows'], dtype=float, mode='r', shape=(len(ROW_OUTPUTS),) + shape))
+        blocks = np.array(np.memmap(paths['blocks'], dtype=float, mode='r',
+                                    shape=(len(BLOCK_OUTPUTS), len(starts), len(columns))))
+
+    with stage('stats_all.unpack', rows=len(order)):
+        celeration, up_bounce, down_bounce = outputs
+        cel_val, bounce_val = fit_labels(*blocks, sizes)
+        group = np.repeat(np.arange(len(starts)), sizes)    # block of every sorted row
+
+        ###
+        # convert to coordinates that match data and put back in original row order
+        ###
+        for i, col in enumerate(columns):
+            set = re.sub('data_', '', col)
+            for name, values in [(f'celeration_{set}', 10 ** celeration[:, i]),
+                                 (f'cel_value_{set}', cel_val[group, i]),
+                                 (f'up_bounce_{set}', 10 ** up_bounce[:, i]),
+                                 (f'down_bounce_{set}', 10 ** down_bounce[:, i]),
+                                 (f'bounce_value_{set}', bounce_val[group, i])]:
+                column = np.full(len(data), np.nan, dtype=object if values.dtype.kind == 'U' else float)
+                column[order] = values
+                data[name] = column
+
+    return data
+
+
+def _fit_chunk(paths, shape, blocks, lo, hi, starts, sizes):
+    # fit the blocks lo to hi, reading and writing only their rows of the shared files
+    first, last = starts[0], starts[-1] + sizes[-1]
+    Y = np.memmap(paths['Y'], dtype=float, mode='r', shape=shape)
+    rows = np.memmap(paths['rows'], dtype=float, mode='r+', shape=(len(ROW_OUTPUTS),) + shape)
+    block_outputs = np.memmap(paths['blocks'], dtype=float, mode='r+', shape=(len(BLOCK_OUTPUTS), blocks, shape[1]))
+
+    results = fit_blocks(np.asarray(Y[first:last]), starts - first, sizes)
+    for i, values in enumerate(results[:len(ROW_OUTPUTS)]):
+        rows[i, first:last] = values
+    for i, values in enumerate(results[len(ROW_OUTPUTS):]):
+        block_outputs[i, lo:hi] = values
+
+    rows.flush()
+    block_outputs.flush()
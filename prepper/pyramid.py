@@ -0,0 +1,164 @@
+import numpy as np
+import pandas as pd
+
+from profiling import stage
+
+# pandas frequency of the bins of every level, each bin is labeled with the day it starts on
+FREQUENCIES = {'daily': 'D', 'weekly': 'W-SUN', 'monthly': 'MS', 'yearly': 'AS'}
+
+# level every level is summed up from, the weighted sums are additive so a year is the sum of its months
+SOURCES = {'weekly': 'daily', 'monthly': 'daily', 'yearly': 'monthly'}
+
+# length of a bin from its first day
+_BIN = {'daily': pd.DateOffset(days=1), 'weekly': pd.DateOffset(days=7),
+        'monthly': pd.DateOffset(months=1), 'yearly': pd.DateOffset(years=1)}
+
+
+class Pyramid:
+    """
+    Aggregation pyramid of a chart series: day -> week, day -> month -> year.
+
+    The days hold the rows summed per day, the same as resample('D').sum(). Every other level holds the
+    counting time weighted sums of its days, so a week of data is the total count over the total counting
+    time of the week and its counting column is one over that total time. Without a counting column every
+    day weighs the same. New rows only refit the weeks, months and years they fall in, and only once that
+    level is asked for, so a daily chart never sums up its weeks, months or years.
+    """
+
+    def __init__(self, data=None):
+        """
+        :param data: rows indexed by date, data columns and optionally a counting column
+        :type data: pd.DataFrame
+        """
+        self.__days = None
+        self.__sums = dict()    # level -> (totals, weights) of its bins
+        self.__stale = dict()   # level -> first and last day its sums are behind on
+        self.__levels = dict()  # level -> memoized level()
+        if data is not None:
+            self.update(data)
+
+    @property
+    def columns(self):
+        """
+        columns of the series
+        """
+        return self.__days.columns
+
+    def update(self, rows):
+        """
+        add new rows, days that are already held are replaced by the days of rows
+
+        :param rows: rows indexed by date
+        :type rows: pd.DataFrame
+        """
+        if rows.empty:
+            return
+        with stage('pyramid.update', rows=len(rows)):
+            days = rows.groupby(rows.index.normalize()).sum()
+            first, last = days.index[0], days.index[-1]
+
+            if self.__days is None:
+                self.__days = days
+            else:
+                held = self.__days[~self.__days.index.isin(days.index)]
+                self.__days = pd.concat([held, days], sort=False).sort_index()
+
+            # the sums catch up once their level is asked for, see __refresh
+            for level in FREQUENCIES:
+                stale = self.__stale.get(level)
+                self.__stale[level] = (first, last) if stale is None else (min(stale[0], first), max(stale[1], last))
+
+            self.__levels.clear()
+
+    def level(self, level):
+        """
+        :param level: 'daily', 'weekly', 'monthly' or 'yearly'
+        :type level: str
+
+        :return data: data per bin indexed by the first day of the bin, only bins holding rows, the daily
+            level is the daily sum of the rows with zeros as NaN
+        :rtype data: pd.DataFrame
+        """
+        if level not in FREQUENCIES:
+            raise ValueError(f'level must be one of {", ".join(FREQUENCIES)}')
+
+        if level not in self.__levels:
+            if level == 'daily':
+                data = self.__days.replace(0.0, np.nan)
+            else:
+                self.__refresh(level)
+                totals, weights = self.__sums[level]
+                data = totals / weights.replace(0.0, np.nan)
+                if 'counting' in totals:
+                    data['counting'] = 1 / totals['counting'].replace(0.0, np.nan)
+                data = data[self.__days.columns]
+            self.__levels[level] = data
+        return self.__levels[level]
+
+    def __refresh(self, level):
+        # refit the bins the stale days fall in, after the level they are summed up from
+        stale = self.__stale.pop(level, None)
+        if stale is None:
+            return
+        first, last = stale
+
+        with stage(f'pyramid.{level}'):
+            if level == 'daily':
+                self.__splice(level, _sums(self.__days.loc[first:last]), first, last)
+                return
+
+            source = SOURCES[level]
+            self.__refresh(source)
+            # every bin the days fall in, whole
+            lo = bin_start(pd.DatetimeIndex([first]), level)[0]
+            hi = bin_start(pd.DatetimeIndex([last]), level)[0] + _BIN[level] - pd.Timedelta(days=1)
+            totals, weights = self.__sums[source]
+            totals, weights = totals.loc[lo:hi], weights.loc[lo:hi]
+            keys = bin_start(totals.index, level)
+            self.__splice(level, (totals.groupby(keys).sum(), weights.groupby(keys).sum()), lo, hi)
+
+    def __splice(self, level, sums, lo, hi):
+        held = self.__sums.get(level)
+        if held is not None:
+            sums = tuple(pd.concat([frame[frame.index < lo], new, frame[frame.index > hi]], sort=False).fillna(0.)
+                         for frame, new in zip(held, sums))
+        self.__sums[level] = sums
+
+
+def bin_start(dates, level):
+    """
+    first day of the bin of every date, weeks start on Sunday
+
+    :param dates: dates
+    :type dates: pd.DatetimeIndex
+
+    :param level: 'daily', 'weekly', 'monthly' or 'yearly'
+    :type level: str
+
+    :return starts: first day of the bin of every date
+    :rtype starts: pd.DatetimeIndex
+    """
+    days = dates.normalize()
+    if level == 'weekly':
+        return days - pd.to_timedelta((days.dayofweek + 1) % 7, unit='D')
+    elif level == 'monthly':
+        return days - pd.to_timedelta(days.day - 1, unit='D')
+    elif level == 'yearly':
+        return days - pd.to_timedelta(days.dayofyear - 1, unit='D')
+    return days
+
+
+def _sums(days):
+    # counting time weighted totals of every data column, the counting column totals the counting time
+    days = days.replace(0.0, np.nan)
+    data = days.drop(columns='counting', errors='ignore')
+    if 'counting' in days:
+        minutes = 1 / days['counting']
+    else:
+        minutes = pd.Series(1., index=days.index)
+
+    totals = data.mul(minutes, axis=0)
+    weights = data.notna().mul(minutes, axis=0)
+    if 'counting' in days:
+        totals['counting'] = minutes
+    return totals.fillna(0.), weights.fillna(0.)
@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+
+
+class Series:
+    """
+    Compact chart series: one row per day that has data, no padding to every calendar day.
+
+    Days are float32 offsets from start, the numeric columns share one float32 array and the phase of
+    every row is an int16 code into a tuple of phase names. Thousands of client series fit in memory where
+    their padded float64 DataFrames with string phases would not.
+    """
+
+    __slots__ = ('start', 'days', 'columns', 'values', 'phases', 'codes')
+
+    def __init__(self, start, days, columns, values, phases=(), codes=None):
+        """
+        :param start: first day of the series
+        :type start: np.datetime64
+
+        :param days: day offset of every row from start, ascending
+        :type days: np.ndarray
+
+        :param columns: names of the columns of values
+        :type columns: tuple
+
+        :param values: rows by columns
+        :type values: np.ndarray
+
+        :param phases: phase names, codes index into them
+        :type phases: tuple
+
+        :param codes: phase code of every row, -1 for rows without a phase, None when there is no phase
+        :type codes: np.ndarray
+        """
+        self.start = np.datetime64(start, 'D')
+        self.days = np.asarray(days, dtype=np.float32)
+        self.columns = tuple(columns)
+        self.values = np.asarray(values, dtype=np.float32).reshape(len(self.days), len(self.columns))
+        self.phases = tuple(phases)
+        self.codes = None if codes is None else np.asarray(codes, dtype=np.int16)
+
+    @classmethod
+    def from_frame(cls, data):
+        """
+        :param data: one row per day indexed by date, numeric columns and optionally a phase column, e.g. the
+            output of combine_cr
+        :type data: pd.DataFrame
+
+        :return series: compact series of data
+        :rtype series: Series
+        """
+        data = data.sort_index()
+        dates = data.index.normalize()
+        start = dates[0] if len(dates) else pd.Timestamp(0)
+        columns = [col for col in data.columns if col != 'phase']
+
+        phases, codes = (), None
+        if 'phase' in data:
+            codes, phases = pd.factorize(data['phase'])
+
+        return cls(start.to_datetime64(),
+                   (dates - start) / pd.Timedelta(days=1),
+                   columns,
+                   data[columns].values,
+                   phases=tuple(phases),
+                   codes=codes)
+
+    def __len__(self):
+        return len(self.days)
+
+    @property
+    def nbytes(self):
+        """
+        bytes held by the arrays of the series
+        """
+        return self.days.nbytes + self.values.nbytes + (0 if self.codes is None else self.codes.nbytes)
+
+    @property
+    def index(self):
+        """
+        date of every row
+        """
+        return pd.DatetimeIndex(self.start + self.days.astype('timedelta64[D]'))
+
+    @property
+    def phase(self):
+        """
+        phase of every row as a pd.Categorical, None when the series has no phase
+        """
+        if self.codes is None:
+            return None
+        return pd.Categorical.from_codes(self.codes, categories=self.phases)
+
+    def column(self, name):
+        """
+        :param name: name of a column
+        :type name: str
+
+        :return values: values of the column, a view into the series
+        :rtype values: np.ndarray
+        """
+        return self.values[:, self.columns.index(name)]
+
+    def to_frame(self, phase='category', columns=None):
+        """
+        :param phase: put the phase column in as 'category', as 'object' strings or leave it out with None
+        :type phase: str
+
+        :param columns: numeric columns to put in, in series order, all of them when None
+        :type columns: list
+
+        :return data: DataFrame indexed by date with a row per day that has data, the numeric columns are a
+            view of the series when all of them are put in, phase is the last column
+        :rtype data: pd.DataFrame
+        """
+        if columns is None:
+            data = pd.DataFrame(self.values, index=self.index, columns=list(self.columns), copy=False)
+        else:
+            keep = [i for i, col in enumerate(self.columns) if col in columns]
+            data = pd.DataFrame(self.values[:, keep], index=self.index, columns=[self.columns[i] for i in keep],
+                                copy=False)
+        if phase is not None and self.codes is not None:
+            data['phase'] = self.phase if phase == 'category' else np.asarray(self.phase, dtype=object)
+        return data
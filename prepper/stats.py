@@ -1,68 +1,282 @@
+import hashlib
 import re
 
 import numpy as np
 import pandas as pd
-from scipy import stats as sci_stats
-from sklearn.linear_model import LinearRegression
 
+from prepper.series import Series
+from profiling import stage
 
-def stats(data, inplace=False):
+
+def stats(data, inplace=False, return_summary=False):
     """
     create all within condition statistics and between condition statistics and
      return in a single DataFrame
 
-    :param data: intial data that stats need to be made for
+    :param data: intial data that stats need to be made for, a prepper.series.Series is read straight into
+        a new DataFrame
     :type data: pd.DataFrame
 
-    :param inplace: whether to do the transformation on original DataFrame or return DataFrame
+    :param inplace: whether to do the transformation on original DataFrame or return DataFrame, ignored for
+        a Series
     :type inplace: bool
 
-    :return data: final DataFrame with all stats
+    :param return_summary: also return the per phase summary table (see phase_summary)
+    :type return_summary: bool
+
+    :return data: final DataFrame with all stats, (data, summary) with return_summary, only summary
+        with return_summary and inplace
     :rtype data: pd.DataFrame
     """
     # work with copy of DataFrame?
-    if not inplace:
+    if isinstance(data, Series):
+        data = data.to_frame(phase='object')    # already a new frame
+        inplace = False
+    elif not inplace:
         data = data.copy()
 
-    data = data.groupby('phase').apply(within_condition_stats)
+    with stage('stats.within', rows=len(data)):
+        data = batch_within_condition_stats(data)
+    with stage('stats.between', rows=len(data)):
+        summary = between_condition_stats(data)
+
+    # return DataFrame?
+    if return_summary:
+        return summary if inplace else (data, summary)
+    if not inplace:
+        return data
+
+
+def between_condition_stats(data):
+    """
+    add the celeration and level multipliers between successive phases, they are worked out on the per
+     phase summary and mapped back onto the rows
+
+    :param data: DataFrame with within condition stats
+    :type data: pd.DataFrame
 
+    :return summary: per phase summary table (see phase_summary)
+    :rtype summary: pd.DataFrame
+    """
     ###########################
     # Between Condition Stats #
     ###########################
+    summary = phase_summary(data)
+    _map_multipliers(data, summary)
+    return summary
+
+
+def phase_summary(data):
+    """
+    one row per phase and data set with the numeric celeration, bounce and multipliers of the phase
+
+    :param data: DataFrame with within condition stats
+    :type data: pd.DataFrame
+
+    :return summary: DataFrame indexed by phase and set in phase order, columns:
+        order - position of the phase, phases are ordered by their first date
+        start, end, rows - first date, last date and number of rows of the phase
+        slope - slope of the celeration line in log10 per row
+        celeration - celeration as a multiplier, direction - 1 accelerating, -1 decelerating
+        start_level, end_level - celeration line on the first and the last row
+        bounce - up bounce line over down bounce line
+        cel_value, bounce_value - as in the rows
+        cel_multiplier - celeration multiplier from the previous phase
+        level_multiplier - start_level over end_level of the previous phase
+    :rtype summary: pd.DataFrame
+    """
+    phase = data['phase']
+    dates = pd.Series(data.index, index=data.index).groupby(phase)
+    start = dates.min().sort_values(kind='mergesort')
+    phases = pd.DataFrame({'order': np.arange(len(start)),
+                           'start': start,
+                           'end': dates.max(),
+                           'rows': dates.size()}, index=start.index)
 
-    # filter columns to iterate over only columns containing cel_value
     r = re.compile('cel_value_*')
-    for col in filter(r.match, data.columns):
-        set = re.sub('cel_value_', '', col)
-        for previous, current in zip(pd.unique(data[col])[::1], pd.unique(data[col])[1::1]):
-            if previous is np.nan or current is np.nan:
+    sets = [re.sub('cel_value_', '', col) for col in filter(r.match, data.columns)]
+    if not sets:
+        return pd.DataFrame(columns=['order', 'start', 'end', 'rows', 'slope', 'celeration', 'direction',
+                                     'start_level', 'end_level', 'bounce', 'cel_value', 'bounce_value',
+                                     'cel_multiplier', 'level_multiplier'],
+                            index=pd.MultiIndex.from_arrays([[], []], names=['phase', 'set']))
+
+    # first and last row of every phase for all sets at once, phases by sets
+    def first(name):
+        return data[[f'{name}_{set}' for set in sets]].groupby(phase).first().reindex(phases.index).values
+
+    start_level = first('celeration').astype(float)
+    end_level = data[[f'celeration_{set}' for set in sets]].groupby(phase).last().reindex(phases.index).values \
+        .astype(float)
+    cel_value = first('cel_value')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.log10(end_level / start_level) / (phases.rows.values[:, None] - 1)
+    slope[np.isnan(slope)] = 0.
+
+    # one row per phase and set, the sets of a phase next to each other
+    summary = phases.loc[phases.index.repeat(len(sets))]
+    summary.index = pd.MultiIndex.from_arrays([summary.index, np.tile(sets, len(phases))], names=['phase', 'set'])
+    summary = summary.assign(start_level=start_level.ravel(),
+                             end_level=end_level.ravel(),
+                             slope=slope.ravel(),
+                             celeration=10 ** (7 * np.abs(slope.ravel())),
+                             cel_value=cel_value.ravel(),
+                             direction=np.where(pd.Series(cel_value.ravel()).str[:1] == '\xD7', 1, -1),
+                             bounce=(first('up_bounce') / first('down_bounce')).astype(float).ravel(),
+                             bounce_value=first('bounce_value').ravel())
+    return _with_multipliers(summary)
+
+
+def cel_multiplier(slope, previous_slope):
+    """
+    celeration multiplier between two successive phases as the change of their weekly celeration in log10,
+     the multiplier is 10 ** abs(change), \xD7 when change >= 0 and \xF7 below
+
+    :param slope: slope of the celeration line of the phase in log10 per row
+    :type slope: np.ndarray
+
+    :param previous_slope: slope of the celeration line of the previous phase
+    :type previous_slope: np.ndarray
+
+    :return change: log10 celeration multiplier of the phase
+    :rtype change: np.ndarray
+    """
+    return 7 * (np.asarray(slope, dtype=float) - np.asarray(previous_slope, dtype=float))
+
+
+def _with_multipliers(summary):
+    # summary indexed by phase and set in phase order with the multipliers of every phase against the phase
+    #  before of the same set, and the columns of phase_summary
+    summary = summary.sort_values('order', kind='mergesort')
+    previous = summary[['slope', 'end_level']].groupby(level='set', sort=False).shift(1)
+    first = summary.order.values == 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = cel_multiplier(summary.slope.values, previous.slope.values)
+        level = summary.start_level.values / previous.end_level.values
+        cel = np.where(change >= 0,
+                       np.char.mod('\xD7%.2f', 10 ** np.abs(change)),
+                       np.char.mod('\xF7%.2f', 10 ** np.abs(change))).astype(object)
+        level = np.where(level >= 1,
+                         np.char.mod('\xD7%.2f', level),
+                         np.char.mod('\xF7%.2f', 1 / level)).astype(object)
+    cel[first] = np.nan
+    level[first] = np.nan
+    summary['cel_multiplier'] = cel
+    summary['level_multiplier'] = level
+    return summary[['order', 'start', 'end', 'rows', 'slope', 'celeration', 'direction',
+                    'start_level', 'end_level', 'bounce', 'cel_value', 'bounce_value',
+                    'cel_multiplier', 'level_multiplier']]
+
+
+def _map_multipliers(data, summary):
+    # cel_multiplier_* and level_multiplier_* columns of the rows from the summary of their phase
+    for set, phases in summary.groupby(level='set', sort=False):
+        phases = phases.droplevel('set')
+        data[f'cel_multiplier_{set}'] = data['phase'].map(phases.cel_multiplier)
+        data[f'level_multiplier_{set}'] = data['phase'].map(phases.level_multiplier)
+
+
+class IncrementalStats:
+    """
+    Statistics of a growing data set, kept up to date as new days of data arrive.
+
+    Rows are held per phase and only the phases that receive new rows, normally just the open one, are
+    refit. Every phase keeps its within condition stats and its summary rows memoized by the content of
+    its rows, so replayed or re-exported rows that do not change a phase do not refit it either. The
+    between condition multipliers are worked out on the summary rows of the phases alone, the rows of all
+    phases are only put together once data is read.
+    """
+
+    def __init__(self, data=None):
+        """
+        :param data: initial data that stats need to be made for
+        :type data: pd.DataFrame
+        """
+        self.__rows = dict()    # phase -> rows of the phase
+        self.__stats = dict()   # phase -> (content key, rows with within condition stats, summary rows)
+        self.__data = None
+        self.__summary = None
+        if data is not None:
+            self.update(data)
+
+    @property
+    def data(self):
+        """
+        all rows with within and between condition stats, same as stats() over all rows
+        """
+        if self.__data is None:
+            phases = sorted((data for _, data, _ in self.__stats.values()), key=lambda data: data.index[0])
+            data = pd.concat(phases).sort_index(kind='mergesort')
+            _map_multipliers(data, self.summary)
+            self.__data = data
+        return self.__data
+
+    @property
+    def summary(self):
+        """
+        per phase summary table of all rows (see phase_summary)
+        """
+        if self.__summary is None:
+            self.__summary = self.__summarize()
+        return self.__summary
+
+    def update(self, rows):
+        """
+        add new rows, rows for dates that are already held replace them
+
+        :param rows: new rows indexed by date with a phase column and data_* columns
+        :type rows: pd.DataFrame
+
+        :return phases: phases that were refit
+        :rtype phases: list
+        """
+        if rows.empty:
+            return []
+        rows = rows.sort_index()
+        changed = set()
+
+        # drop the rows that are being replaced, only phases overlapping the new dates can hold them
+        for phase, held in list(self.__rows.items()):
+            if held.index[0] <= rows.index[-1] and held.index[-1] >= rows.index[0]:
+                replaced = held.index.isin(rows.index)
+                if replaced.any():
+                    self.__rows[phase] = held[~replaced]
+                    changed.add(phase)
+
+        for phase, new in rows.groupby('phase', sort=False):
+            held = self.__rows.get(phase)
+            self.__rows[phase] = new if held is None else pd.concat([held, new]).sort_index()
+            changed.add(phase)
+
+        refit = []
+        dropped = False
+        for phase in changed:
+            held = self.__rows[phase]
+            if held.empty:
+                del self.__rows[phase]
+                dropped |= self.__stats.pop(phase, None) is not None
                 continue
-            # preparing data
-            previous_sign = previous[:1]
-            current_sign = current[:1]
-            previous_value = float(previous[1:])
-            current_value = float(current[1:])
-
-            # check for direction and calculate multiplier
-            if previous_sign == current_sign:
-                if previous_value == current_value:
-                    data.loc[
-                        data[col] == current, f'cel_multiplier_{set}'] = f'\xF7{previous_value/current_value:.2f}'
-                else:
-                    data.loc[
-                        data[col] == current, f'cel_multiplier_{set}'] = f'\xD7{current_value / previous_value:.2f}'
-            else:
-                val = previous_value * current_value
-                if previous_value == '\xF7':
-                    data.loc[
-                        data[col] == current, f'cel_multiplier_{set}'] = f'\xD7{val:.2f}'
-                else:
-                    data.loc[
-                        data[col] == current, f'cel_multiplier_{set}'] = f'\xF7{val:.2f}'
 
-    # return DataFrame?
-    if not inplace:
-        return data
+            key = _content_key(held)
+            if phase not in self.__stats or self.__stats[phase][0] != key:
+                with stage('stats.within', rows=len(held)):
+                    data = batch_within_condition_stats(held.copy())
+                with stage('stats.summary', rows=len(held)):
+                    self.__stats[phase] = (key, data, phase_summary(data))
+                refit.append(phase)
+
+        if refit or dropped:
+            self.__data = None
+            self.__summary = None
+        return refit
+
+    def __summarize(self):
+        # summary rows of the phases in phase order, the multipliers against the phase before worked out anew
+        phases = sorted(self.__stats.values(), key=lambda memo: memo[1].index[0])
+        summary = pd.concat([rows for _, _, rows in phases])
+        summary['order'] = np.repeat(np.arange(len(phases)), [len(rows) for _, _, rows in phases])
+        with stage('stats.between', rows=len(summary)):
+            return _with_multipliers(summary)
 
 
 def within_condition_stats(data):
@@ -80,24 +294,23 @@ def within_condition_stats(data):
         ###
 
         # z-score to remove outliers
-        z = abs(sci_stats.zscore(np.log10(data[col].values)))
+        z = abs(_zscore(np.log10(data[col].values)))
 
         # prepare data for linear regression
         Y = data[col].values[z < 3]
-        Y = np.log10(Y.reshape(-1, 1))
-        X = np.arange(start=0, stop=len(Y), step=1).reshape(-1, 1)
+        Y = np.log10(Y)
+        X = np.arange(start=0, stop=len(Y), step=1)
 
         # linear regression
-        regressor = LinearRegression()
-        regressor.fit(X[:11], Y[:11])
+        slope, intercept = _linear_fit(X[:11], Y[:11])
 
-        predict = regressor.predict(X)
+        predict = intercept + slope * X
 
         diff = Y - predict
 
         # get celeration line that matches data
-        X = np.arange(start=0, stop=len(data[col]), step=1).reshape(-1, 1)
-        celeration = regressor.predict(X)
+        X = np.arange(start=0, stop=len(data[col]), step=1)
+        celeration = intercept + slope * X
 
         ###
         # calculate bounce lines
@@ -112,7 +325,7 @@ def within_condition_stats(data):
         ###
         # calculate cel_val
         ###
-        slope = 10 ** (7 * abs(regressor.coef_[0][0]))
+        slope = 10 ** (7 * abs(slope))
         if celeration[0] < celeration[-1]:
             cel_val = f'\xD7{slope:.2f}'
         else:
@@ -121,7 +334,7 @@ def within_condition_stats(data):
         ###
         # calculate bounce_val
         ###
-        bounce_val = f'\xD7{(up_bounce[0][0] / down_bounce[0][0]):.2f}'
+        bounce_val = f'\xD7{(up_bounce[0] / down_bounce[0]):.2f}'
 
         ###
         # convert to coordinates that match data
@@ -137,3 +350,279 @@ def within_condition_stats(data):
         data[f'bounce_value_{set}'] = bounce_val
 
     return data
+
+
+def batch_within_condition_stats(data):
+    """
+    within condition statistics for every phase and every data_* column in one vectorized pass, gives the
+     same results as data.groupby('phase').apply(within_condition_stats) on every phase the z-score filter
+     keeps all points of, within_condition_stats fails on the others (see tests/test_stats.py)
+
+    the z-score filter, the least squares fit on the first 11 points and the bounce envelope are computed
+     with closed form sums over the log10 values of all phases and targets at once
+
+    :param data: data with a phase column and data_* columns, rows within a phase in date order
+    :type data: pd.DataFrame
+
+    :return data: data with celeration_*, cel_value_*, up_bounce_*, down_bounce_* and bounce_value_* columns
+    :rtype data: pd.DataFrame
+    """
+    # filter columns to iterate over only columns containing data
+    r = re.compile('data_*')
+    columns = list(filter(r.match, data.columns))
+
+    # rows without a phase get no stats, same as groupby
+    codes, _ = pd.factorize(data['phase'])
+    rows = np.flatnonzero(codes >= 0)
+    if not columns or not len(rows):
+        return data
+
+    # sort rows by phase so every phase is a contiguous block
+    order = rows[np.argsort(codes[rows], kind='stable')]
+    codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    sizes = np.diff(np.r_[starts, len(order)])
+    group = np.repeat(np.arange(len(starts)), sizes)    # phase block of every sorted row
+
+    Y = np.log10(data[columns].values[order].astype(float))
+    celeration, up_bounce, down_bounce, slope, intercept, up, down = fit_blocks(Y, starts, sizes)
+    cel_val, bounce_val = fit_labels(slope, intercept, up, down, sizes)
+
+    ###
+    # convert to coordinates that match data and put back in original row order
+    ###
+    for i, col in enumerate(columns):
+        set = re.sub('data_', '', col)
+        for name, values in [(f'celeration_{set}', 10 ** celeration[:, i]),
+                             (f'cel_value_{set}', cel_val[group, i]),
+                             (f'up_bounce_{set}', 10 ** up_bounce[:, i]),
+                             (f'down_bounce_{set}', 10 ** down_bounce[:, i]),
+                             (f'bounce_value_{set}', bounce_val[group, i])]:
+            column = np.full(len(data), np.nan, dtype=object if values.dtype.kind == 'U' else float)
+            column[order] = values
+            data[name] = column
+
+    return data
+
+
+def fit_blocks(Y, starts, sizes):
+    """
+    z-score filter, least squares fit on the first 11 kept points and bounce envelope of every block of
+     rows, the engine of batch_within_condition_stats
+
+    :param Y: log10 values, rows by data columns, every block is a contiguous run of rows in date order
+    :type Y: np.ndarray
+
+    :param starts: first row of every block
+    :type starts: np.ndarray
+
+    :param sizes: number of rows of every block
+    :type sizes: np.ndarray
+
+    :return celeration, up_bounce, down_bounce, slope, intercept, up, down: log10 celeration and bounce
+        lines per row, and the fit and the bounce offsets per block
+    :rtype celeration, up_bounce, down_bounce, slope, intercept, up, down: tuple
+    """
+    group = np.repeat(np.arange(len(starts)), sizes)    # block of every row
+    position = np.arange(len(Y)) - starts[group]        # position of every row within its block
+    columns = Y.shape[1]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ###
+        # z-score to remove outliers
+        ###
+        mean = np.add.reduceat(Y, starts, axis=0) / sizes[:, None]
+        std = np.sqrt(np.add.reduceat((Y - mean[group]) ** 2, starts, axis=0) / sizes[:, None])
+        keep = abs((Y - mean[group]) / std[group]) < 3
+
+        # x of each kept point counts only the kept points before it in the phase
+        kept = np.cumsum(keep, axis=0)
+        X = kept - np.vstack([np.zeros((1, columns)), kept])[starts][group] - 1
+
+        ###
+        # linear regression on the first 11 kept points
+        ###
+        fit = keep & (X < 11)
+        n = np.add.reduceat(fit, starts, axis=0)
+        x_mean = np.add.reduceat(np.where(fit, X, 0.), starts, axis=0) / n
+        y_mean = np.add.reduceat(np.where(fit, Y, 0.), starts, axis=0) / n
+        dx = np.where(fit, X - x_mean[group], 0.)
+        dy = np.where(fit, Y - y_mean[group], 0.)
+        sxx = np.add.reduceat(dx * dx, starts, axis=0)
+        sxy = np.add.reduceat(dx * dy, starts, axis=0)
+        slope = np.where(sxx > 0, sxy / sxx, 0.)
+        intercept = y_mean - slope * x_mean
+
+        ###
+        # calculate bounce lines
+        ###
+        diff = Y - (intercept[group] + slope[group] * X)
+        up = np.maximum.reduceat(np.where(keep, diff, -np.inf), starts, axis=0)
+        down = np.minimum.reduceat(np.where(keep, diff, np.inf), starts, axis=0)
+
+        # get celeration line that matches data
+        celeration = intercept[group] + slope[group] * position[:, None]
+        up_bounce = celeration + up[group]
+        down_bounce = celeration + down[group]
+
+    return celeration, up_bounce, down_bounce, slope, intercept, up, down
+
+
+def fit_labels(slope, intercept, up, down, sizes):
+    """
+    :param slope, intercept, up, down: fit and bounce offsets per block as given by fit_blocks
+    :type slope, intercept, up, down: np.ndarray
+
+    :param sizes: number of rows of every block
+    :type sizes: np.ndarray
+
+    :return cel_val, bounce_val: celeration and bounce values of every block as shown on the chart
+    :rtype cel_val, bounce_val: (np.ndarray, np.ndarray)
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        increasing = intercept < intercept + slope * (sizes[:, None] - 1)
+        cel_val = np.where(increasing,
+                           np.char.mod('\xD7%.2f', 10 ** (7 * abs(slope))),
+                           np.char.mod('\xF7%.2f', 10 ** (7 * abs(slope))))
+        bounce_val = np.char.mod('\xD7%.2f', (intercept + up) / (intercept + down))
+
+    return cel_val, bounce_val
+
+
+def rolling_stats(data, window=28, bounce=2., min_points=3, by_phase=True):
+    """
+    celeration and bounce of the trailing window of days of every row, every data_* column at once
+
+    the least squares line of every window comes from running sums of x, y, x*x, x*y and y*y, so a series
+     costs O(n) whatever the window. A running maximum cannot drop the extreme point leaving a window in
+     O(1), so the bounce lines are the fit plus and minus bounce standard deviations of the residuals in
+     the window instead of the envelope of within_condition_stats, there is no z-score filter either
+
+    :param data: data indexed by date with data_* columns and optionally a phase column, rows in date order
+    :type data: pd.DataFrame
+
+    :param window: calendar days of the window ending on every row, the row's day included
+    :type window: int
+
+    :param bounce: residual standard deviations between the celeration line and each bounce line
+    :type bounce: float
+
+    :param min_points: fewest values a window needs to be fit, rows with fewer get NaN
+    :type min_points: int
+
+    :param by_phase: start the window no earlier than the phase of the row
+    :type by_phase: bool
+
+    :return data: data with rolling_celeration_*, rolling_cel_value_*, rolling_up_bounce_*,
+        rolling_down_bounce_* and rolling_bounce_value_* columns, the lines are the value of the window's
+        fit on the row's day in the coordinates of the data
+    :rtype data: pd.DataFrame
+    """
+    # filter columns to iterate over only columns containing data
+    r = re.compile('data_*')
+    columns = list(filter(r.match, data.columns))
+    if not columns or not len(data):
+        return data
+
+    with stage('stats.rolling', rows=len(data)):
+        x = ((data.index.normalize() - data.index[0].normalize()) / pd.Timedelta(days=1)).values.astype(float)
+
+        # first row of the window of every row
+        lo = np.searchsorted(x, x - window, side='right')
+        if by_phase and 'phase' in data:
+            phase = data['phase'].values
+            change = np.r_[True, phase[1:] != phase[:-1]]
+            lo = np.maximum(lo, np.maximum.accumulate(np.where(change, np.arange(len(x)), 0)))
+
+        # x counts from the first day of the row's block of window days, so the sums stay small however long
+        #  the series, see _window_sums
+        block = (x // window).astype(int)
+        x = x - block * window
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            Y = np.log10(data[columns].values.astype(float))
+            valid = np.isfinite(Y)
+            Y = np.where(valid, Y, 0.)
+            X = np.where(valid, x[:, None], 0.)
+
+            ###
+            # linear regression of every window
+            ###
+            n, sx, sy, sxx, sxy, syy = _window_sums([valid, X, Y, X * X, X * Y, Y * Y], lo, block, window)
+            sxx = sxx - sx * sx / n
+            sxy = sxy - sx * sy / n
+            syy = syy - sy * sy / n
+            slope = sxy / sxx
+            intercept = (sy - slope * sx) / n
+            fit = np.isfinite(slope) & (n >= min_points) & (sxx > 0)
+
+            ###
+            # calculate bounce lines
+            ###
+            spread = bounce * np.sqrt(np.maximum(syy - slope * sxy, 0.) / n)
+            celeration = intercept + slope * x[:, None]
+            up_bounce = celeration + spread
+            down_bounce = celeration - spread
+
+            cel_val = np.where(slope > 0,
+                               np.char.mod('\xD7%.2f', 10 ** (7 * abs(slope))),
+                               np.char.mod('\xF7%.2f', 10 ** (7 * abs(slope))))
+            bounce_val = np.char.mod('\xD7%.2f', 10 ** (2 * spread))
+
+        ###
+        # convert to coordinates that match data
+        ###
+        for i, col in enumerate(columns):
+            set = re.sub('data_', '', col)
+            for name, values in [(f'rolling_celeration_{set}', 10 ** celeration[:, i]),
+                                 (f'rolling_cel_value_{set}', cel_val[:, i]),
+                                 (f'rolling_up_bounce_{set}', 10 ** up_bounce[:, i]),
+                                 (f'rolling_down_bounce_{set}', 10 ** down_bounce[:, i]),
+                                 (f'rolling_bounce_value_{set}', bounce_val[:, i])]:
+                data[name] = np.where(fit[:, i], values.astype(object if values.dtype.kind == 'U' else float),
+                                      np.nan)
+
+    return data
+
+
+def _window_sums(values, lo, block, window):
+    # n, x, y, x*x, x*y and y*y summed over the rows lo to i of every row i, x counted from the first day of
+    #  the row's block. The running sums restart at every block, a window reaches back into the block
+    #  before at most and that part is moved onto the origin of the row's block
+    rows = len(lo)
+    stacked = np.concatenate([np.asarray(value, dtype=float) for value in values], axis=1)
+    sums = pd.DataFrame(stacked).groupby(block).cumsum().values
+    sums = np.vstack([np.zeros((1, stacked.shape[1])), sums])    # sums[i + 1] is the running sum up to row i
+
+    first = np.searchsorted(block, block, side='left')     # first row of the block of every row
+    start = np.maximum(lo, first)
+    current = sums[np.arange(rows) + 1] - np.where((start > first)[:, None], sums[start], 0.)
+
+    # rows of the window in the block before, empty where the window starts in the row's block
+    before = lo < first
+    end = np.where(before, first - 1, 0)
+    previous = np.where(before[:, None],
+                        sums[end + 1] - np.where((lo > first[end])[:, None], sums[lo], 0.), 0.)
+
+    n, sx, sy, sxx, sxy, syy = np.split(previous, len(values), axis=1)
+    shift = np.where(before, (block - block[end]) * window, 0.)[:, None]
+    previous = [n, sx - shift * n, sy, sxx - 2 * shift * sx + shift * shift * n, sxy - shift * sy, syy]
+    return [now + then for now, then in zip(np.split(current, len(values), axis=1), previous)]
+
+
+def _zscore(values):
+    # same as scipy.stats.zscore, population standard deviation
+    return (values - values.mean()) / values.std()
+
+
+def _linear_fit(X, Y):
+    # ordinary least squares of a line, same as sklearn's LinearRegression on one feature
+    dx = X - X.mean()
+    sxx = (dx * dx).sum()
+    slope = (dx * (Y - Y.mean())).sum() / sxx if sxx > 0 else 0.
+    return slope, Y.mean() - slope * X.mean()
+
+
+def _content_key(data):
+    values = pd.util.hash_pandas_object(data, index=True).values
+    return hashlib.sha1(values.tobytes() + repr(list(data.columns)).encode()).hexdigest()
@@ -0,0 +1,385 @@
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from prepper.cache import DEFAULT_FORMAT
+from prepper.stats import cel_multiplier
+
+# bump whenever the table layout changes so stores written before are rebuilt instead of read
+STORE_VERSION = '1'
+
+# columns of the store, one row per phase of every client, target and data set
+COLUMNS = ('client', 'target', 'set', 'phase', 'order', 'current', 'start', 'end', 'rows',
+           'celeration', 'bounce', 'cel_multiplier', 'level_multiplier', 'start_level', 'end_level')
+
+# columns with a sorted index, queries on them are answered with a binary search
+INDEXES = ('client', 'target', 'phase', 'start', 'end', 'celeration', 'bounce')
+
+
+def phase_table(data, client=None, target=None):
+    """
+    one row per phase and data set of every series with numeric celeration, bounce and multipliers, the
+     caseload wide counterpart of phase_summary
+
+    celeration and the multipliers are signed multipliers that order the way the chart reads, ×2 is 2.,
+     ÷2 is -2. and ÷3 is -3., so "÷2 or worse" is celeration <= -2. Bounce is the up bounce line over the
+     down bounce line
+
+    :param data: stats of a caseload indexed by ClientId, target and date as given by stats_all, or stats of
+        a single series indexed by date
+    :type data: pd.DataFrame
+
+    :param client: client of data indexed by date alone
+    :param target: target of data indexed by date alone
+
+    :return table: DataFrame with the COLUMNS of a CaseloadStore
+    :rtype table: pd.DataFrame
+    """
+    if data.index.nlevels == 3:
+        clients = data.index.get_level_values(0).values
+        targets = data.index.get_level_values(1).values
+    elif data.index.nlevels == 1 and client is not None and target is not None:
+        clients = np.full(len(data), client)
+        targets = np.full(len(data), target)
+    else:
+        raise ValueError('data must be indexed by client, target and date, or by date with client and target given.')
+
+    # a block is one phase of one series, rows without a phase or stats are left out
+    dates = data.index.get_level_values(-1).values.astype('datetime64[ns]')
+    series, _ = pd.factorize(pd.MultiIndex.from_arrays([clients, targets]))
+    phases, phase_names = pd.factorize(data['phase'])
+    codes, _ = pd.factorize(np.where(phases >= 0, series * (len(phase_names) + 1) + phases, -1))
+    codes[phases < 0] = -1
+
+    r = re.compile('cel_value_*')
+    sets = [re.sub('cel_value_', '', col) for col in filter(r.match, data.columns)]
+    rows = np.flatnonzero(codes >= 0)
+    if not sets or not len(rows):
+        return pd.DataFrame({name: [] for name in COLUMNS})
+
+    # sort rows by block and date so every block is a contiguous run
+    order = rows[np.lexsort((dates[rows], codes[rows]))]
+    codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    sizes = np.diff(np.r_[starts, len(order)])
+    lasts = starts + sizes - 1
+
+    ###
+    # phases of a series in date order, previous is the block before in the same series
+    ###
+    block_series = series[order][starts]
+    block_start = dates[order][starts]
+    by_date = np.lexsort((block_start, block_series))
+    first = np.r_[True, block_series[by_date][1:] != block_series[by_date][:-1]]
+    position = np.arange(len(starts)) - np.maximum.accumulate(np.where(first, np.arange(len(starts)), 0))
+    phase_order = np.empty(len(starts), dtype=int)
+    phase_order[by_date] = position
+    current = np.zeros(len(starts), dtype=bool)
+    current[by_date[np.r_[first[1:], True]]] = True
+    previous = np.full(len(starts), -1)
+    previous[by_date[~first]] = by_date[:-1][~first[1:]]
+
+    tables = []
+    for set in sets:
+        cel = data[f'celeration_{set}'].values[order].astype(float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            start_level, end_level = cel[starts], cel[lasts]
+            slope = np.where(sizes > 1, np.log10(end_level / start_level) / (sizes - 1), 0.)
+            level = np.log10(start_level / end_level[previous])
+            bounce = data[f'up_bounce_{set}'].values[order][starts] / data[f'down_bounce_{set}'].values[order][starts]
+        slope[np.isnan(start_level)] = np.nan
+        change = cel_multiplier(slope, slope[previous])
+        change[previous < 0] = np.nan
+        level[previous < 0] = np.nan
+
+        tables.append(pd.DataFrame({'client': clients[order][starts],
+                                    'target': targets[order][starts],
+                                    'set': set,
+                                    'phase': phase_names.take(phases[order][starts]),
+                                    'order': phase_order,
+                                    'current': current,
+                                    'start': block_start,
+                                    'end': dates[order][lasts],
+                                    'rows': sizes,
+                                    'celeration': _signed(7 * slope),
+                                    'bounce': bounce.astype(float),
+                                    'cel_multiplier': _signed(change),
+                                    'level_multiplier': _signed(level),
+                                    'start_level': start_level,
+                                    'end_level': end_level}))
+
+    return pd.concat(tables, ignore_index=True)[list(COLUMNS)]
+
+
+class CaseloadStore:
+    """
+    Celeration and bounce of every phase of a caseload, queryable by client, target, phase, date,
+    celeration and bounce.
+
+    The store is one table of phase_table rows with a sorted index on each of INDEXES. A filter on an
+    indexed column is a binary search, the narrowest filter picks the candidate rows and the others are
+    checked on those alone, so a query touches about as many rows as it returns. Updates replace the
+    phases of the series they hold and merge the new rows into the sorted indexes without sorting the
+    rest again. With a directory the store is read from it and written back to it by save.
+    """
+
+    def __init__(self, directory=None, format=None):
+        """
+        :param directory: directory the store is kept in, read from when it holds a store
+        :type directory: str
+
+        :param format: 'feather' or 'pickle', defaults to feather when pyarrow is installed
+        :type format: str
+        """
+        self.directory = directory
+        self.format = format or DEFAULT_FORMAT
+        if self.format not in ('feather', 'pickle'):
+            raise ValueError('CaseloadStore.format must be either feather or pickle.')
+
+        self.__set_table(pd.DataFrame({name: [] for name in COLUMNS}))
+        self.__index = {name: np.arange(0) for name in INDEXES}
+        self.__sort_keys()
+        if directory is not None:
+            self.__load()
+
+    def __len__(self):
+        return len(self.table)
+
+    def update(self, data, client=None, target=None):
+        """
+        put in the stats of recomputed series, every phase held for those series is replaced
+
+        :param data: stats indexed by ClientId, target and date as given by stats_all, or stats of a single
+            series indexed by date, see phase_table
+        :type data: pd.DataFrame
+
+        :param client: client of data indexed by date alone
+        :param target: target of data indexed by date alone
+
+        :return rows: number of rows put in
+        :rtype rows: int
+        """
+        rows = phase_table(data, client=client, target=target)
+        keys = pd.MultiIndex.from_arrays([rows.client.values, rows.target.values]).unique()
+        self.__replace(self.__series_mask(keys), rows)
+        return len(rows)
+
+    def remove(self, client, target=None):
+        """
+        drop every phase of a client, or of one target of a client
+
+        :param client: client to drop
+        :param target: target of client to drop, all targets when None
+
+        :return rows: number of rows dropped
+        :rtype rows: int
+        """
+        drop = self.__columns['client'] == client
+        if target is not None:
+            drop &= self.__columns['target'] == target
+        self.__replace(drop, None)
+        return int(drop.sum())
+
+    def query(self, client=None, target=None, phase=None, set=None, date=None, current=None,
+              celeration=None, bounce=None):
+        """
+        rows matching all of the given filters, e.g. query(current=True, celeration=(None, '÷2')) for the
+         current phases with a ÷2 or worse celeration
+
+        :param client, target, phase, set: value or list of values to match
+        :param date: date or (first, last) dates, phases running on any of them
+        :param current: True for the current phase of every series only, False for all others
+
+        :param celeration, bounce: (low, high) bounds, both inclusive and either one None, celeration bounds
+            may be chart values such as '÷2'
+        :type celeration, bounce: tuple
+
+        :return rows: matching rows in store order
+        :rtype rows: pd.DataFrame
+        """
+        return self.table.iloc[np.sort(self.__match(client=client, target=target, phase=phase, set=set, date=date,
+                                                    current=current, celeration=celeration, bounce=bounce))]
+
+    def top(self, column, k=10, largest=True, **filters):
+        """
+        k rows with the largest (or smallest) values of a column among the rows matching filters, e.g.
+         top('bounce', date=(monday, sunday)) for the largest bounces of the week
+
+        :param column: numeric column to rank by, e.g. celeration, bounce or cel_multiplier
+        :type column: str
+
+        :param k: number of rows
+        :type k: int
+
+        :param largest: largest values first, else smallest first
+        :type largest: bool
+
+        :param filters: as passed to query
+
+        :return rows: at most k rows ranked by column, rows without a value are left out
+        :rtype rows: pd.DataFrame
+        """
+        if not any(value is not None for value in filters.values()) and column in INDEXES:
+            # the index already holds the ranking
+            keys, perm = self.__keys[column], self.__index[column]
+            valid = perm[:np.searchsorted(keys, np.nan)] if keys.dtype.kind == 'f' else perm
+            rows = valid[::-1][:k] if largest else valid[:k]
+            return self.table.iloc[rows]
+
+        rows = self.__match(**filters)
+        values = self.__columns[column][rows].astype(float)
+        rows, values = rows[~np.isnan(values)], values[~np.isnan(values)]
+        if largest:
+            values = -values
+        if k < len(rows):
+            best = np.argpartition(values, k)[:k]
+            rows, values = rows[best], values[best]
+        return self.table.iloc[rows[np.argsort(values, kind='mergesort')]]
+
+    def save(self):
+        """
+        write the store to its directory, readers never see a partly written store
+        """
+        if self.directory is None:
+            raise ValueError('CaseloadStore.save needs a directory.')
+        os.makedirs(self.directory, exist_ok=True)
+        partial = os.path.join(self.directory, f'.{os.getpid()}.tmp')
+
+        table = os.path.join(self.directory, f'table.{self.format}')
+        if self.format == 'pickle':
+            self.table.to_pickle(f'{partial}.{self.format}')
+        else:
+            self.table.to_feather(f'{partial}.{self.format}')
+        np.savez(f'{partial}.npz', **self.__index)
+        with open(f'{partial}.json', 'w') as f:
+            json.dump({'format': self.format, 'version': STORE_VERSION}, f)
+
+        os.replace(f'{partial}.{self.format}', table)
+        os.replace(f'{partial}.npz', os.path.join(self.directory, 'indexes.npz'))
+        os.replace(f'{partial}.json', os.path.join(self.directory, 'meta.json'))
+
+    def __load(self):
+        try:
+            with open(os.path.join(self.directory, 'meta.json')) as f:
+                meta = json.load(f)
+            if meta['version'] != STORE_VERSION:
+                return
+            path = os.path.join(self.directory, f'table.{meta["format"]}')
+            table = pd.read_pickle(path) if meta['format'] == 'pickle' else pd.read_feather(path)
+            with np.load(os.path.join(self.directory, 'indexes.npz')) as indexes:
+                index = {name: indexes[name] for name in INDEXES}
+        except (OSError, ValueError, KeyError):
+            return
+
+        self.__set_table(table)
+        self.__index = index
+        self.__sort_keys()
+
+    def __set_table(self, table):
+        self.table = table
+        self.__columns = {name: table[name].values for name in COLUMNS}
+
+    def __sort_keys(self):
+        self.__keys = {name: self.__columns[name][perm] for name, perm in self.__index.items()}
+
+    def __series_mask(self, keys):
+        # rows of the series keys, only the rows of their clients are looked at
+        mask = np.zeros(len(self.table), dtype=bool)
+        if not len(self.table) or not len(keys):
+            return mask
+
+        rows = np.concatenate([self.__range('client', client, client)
+                               for client in keys.get_level_values(0).unique()])
+        held = pd.MultiIndex.from_arrays([self.__columns['client'][rows], self.__columns['target'][rows]])
+        mask[rows[held.isin(keys)]] = True
+        return mask
+
+    def __replace(self, drop, rows):
+        ###
+        # drop rows, the indexes stay sorted once their positions are renumbered
+        ###
+        keep = ~drop
+        renumber = np.cumsum(keep) - 1
+        index = {name: renumber[perm[keep[perm]]] for name, perm in self.__index.items()}
+        table = self.table[keep]
+
+        ###
+        # add rows, merging them into every index
+        ###
+        if rows is not None and len(rows):
+            table = pd.concat([table, rows], ignore_index=True) if len(table) else rows.reset_index(drop=True)
+            for name, perm in index.items():
+                new = rows[name].values
+                new_perm = np.argsort(new, kind='mergesort')
+                held = table[name].values[perm]
+                index[name] = np.insert(perm, np.searchsorted(held, new[new_perm], side='right'),
+                                        new_perm + len(table) - len(rows))
+        else:
+            table = table.reset_index(drop=True)
+
+        self.__set_table(table)
+        self.__index = index
+        self.__sort_keys()
+
+    def __match(self, **filters):
+        # (rows, span) per filter answerable from an index, masks for the rest
+        spans, masks = [], []
+        for name, value in filters.items():
+            if value is None:
+                continue
+            if name == 'date':
+                first, last = value if isinstance(value, tuple) else (value, value)
+                first, last = np.datetime64(pd.Timestamp(first), 'ns'), np.datetime64(pd.Timestamp(last), 'ns')
+                spans.append(self.__range('start', None, last))
+                masks.append(('end', lambda values, first=first: values >= first))
+            elif name == 'current':
+                masks.append((name, lambda values, value=value: values == value))
+            elif name in ('celeration', 'bounce'):
+                low, high = (_value(bound) for bound in value)
+                spans.append(self.__range(name, low, high))
+            elif name in INDEXES:
+                values = value if isinstance(value, (list, tuple, set, np.ndarray, pd.Index)) else [value]
+                spans.append(np.concatenate([self.__range(name, v, v) for v in values] or [np.arange(0)]))
+            elif name == 'set':
+                values = list(value) if isinstance(value, (list, tuple)) else [value]
+                masks.append((name, lambda column, values=values: np.isin(column, values)))
+            else:
+                raise TypeError(f'unknown filter {name}')
+
+        if not spans:
+            rows = np.arange(len(self.table))
+        else:
+            spans.sort(key=len)
+            rows = spans[0]
+            for other in spans[1:]:
+                rows = rows[np.isin(rows, other, assume_unique=True)] if len(rows) else rows
+
+        for name, test in masks:
+            rows = rows[test(self.__columns[name][rows])]
+        return rows
+
+    def __range(self, name, low, high):
+        # rows of an index with low <= value <= high, None leaves that end open
+        keys = self.__keys[name]
+        lo = 0 if low is None else np.searchsorted(keys, low, side='left')
+        hi = len(keys) if high is None else np.searchsorted(keys, high, side='right')
+        if keys.dtype.kind == 'f' and high is None:
+            hi = np.searchsorted(keys, np.nan, side='left')     # no value is never in range
+        return self.__index[name][lo:hi]
+
+
+def _signed(log_values):
+    # log10 changes to multipliers signed the way the chart reads them, 0.3 -> 2. and -0.3 -> -2.
+    with np.errstate(invalid='ignore'):
+        return np.where(log_values < 0, -1., 1.) * 10 ** np.abs(log_values)
+
+
+def _value(bound):
+    # chart values such as '×2' and '÷1.5' to signed multipliers, anything else is taken as given
+    if isinstance(bound, str):
+        sign = -1. if bound[:1] in ('\xF7', '/') else 1.
+        return sign * float(bound.lstrip('\xD7\xF7*/x'))
+    return bound
@@ -0,0 +1,152 @@
+import threading
+import time
+import tracemalloc
+
+# hooks and the stack of open stages are per thread, a report only sees the stages run on its own thread
+_local = threading.local()
+
+
+def add_hook(hook):
+    """
+    call hook with an event dict every time a stage finishes on the calling thread, the event holds stage,
+     parent, seconds, rows, peak_bytes (None unless tracemalloc is tracing) and error
+
+    :param hook: callable taking the event dict
+    :type hook: callable
+    """
+    _local.__dict__.setdefault('hooks', []).append(hook)
+
+
+def remove_hook(hook):
+    """
+    :param hook: hook given to add_hook on the calling thread
+    :type hook: callable
+    """
+    _local.hooks.remove(hook)
+
+
+def stage(name, rows=None):
+    """
+    context manager timing one stage of the pipeline, a shared no-op when no hook is registered on the
+     calling thread
+
+    :param name: name of the stage, e.g. 'stats.within'
+    :type name: str
+
+    :param rows: number of rows the stage works on, may also be set on the stage inside the with block
+    :type rows: int
+
+    :return stage: context manager
+    """
+    if not getattr(_local, 'hooks', None):
+        return _NULL_STAGE
+    return _Stage(name, rows)
+
+
+class Report:
+    """
+    Collects every stage that finishes on the thread that entered the report while the report is active.
+
+    With memory=True tracemalloc is started for the lifetime of the report so every stage also gets its
+    peak traced memory. Tracing slows everything down, so compare seconds only between reports taken
+    the same way.
+    """
+
+    def __init__(self, memory=False):
+        """
+        :param memory: trace memory to get peak_bytes per stage
+        :type memory: bool
+        """
+        self.memory = memory
+        self.stages = []
+        self.__tracing = False
+
+    def __enter__(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.__tracing = True
+        add_hook(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        remove_hook(self)
+        if self.__tracing:
+            tracemalloc.stop()
+            self.__tracing = False
+        return False
+
+    def __call__(self, event):
+        self.stages.append(event)
+
+    def totals(self):
+        """
+        :return totals: stage name to total seconds, number of calls and rows, in the order stages first finished
+        :rtype totals: dict
+        """
+        totals = dict()
+        for event in self.stages:
+            total = totals.setdefault(event['stage'], {'seconds': 0., 'calls': 0, 'rows': 0})
+            total['seconds'] += event['seconds']
+            total['calls'] += 1
+            total['rows'] += event['rows'] or 0
+        return totals
+
+    def to_dict(self):
+        """
+        :return report: json serializable report with every stage and the totals per stage name
+        :rtype report: dict
+        """
+        return {'stages': list(self.stages), 'totals': self.totals()}
+
+
+class _NullStage:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+
+    def __init__(self, name, rows):
+        self.name = name
+        self.rows = rows
+        self.peak_bytes = None
+
+    def __enter__(self):
+        stack = _local.__dict__.setdefault('stack', [])
+        self.parent = stack[-1] if stack else None
+        if tracemalloc.is_tracing() and hasattr(tracemalloc, 'reset_peak'):
+            # hand the peak so far to the enclosing stage before restarting it for this one
+            if self.parent is not None:
+                self.parent.peak_bytes = max(self.parent.peak_bytes or 0, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        _local.stack.pop()
+        if tracemalloc.is_tracing():
+            self.peak_bytes = max(self.peak_bytes or 0, tracemalloc.get_traced_memory()[1])
+            if self.parent is not None:
+                self.parent.peak_bytes = max(self.parent.peak_bytes or 0, self.peak_bytes)
+
+        event = {'stage': self.name,
+                 'parent': self.parent.name if self.parent is not None else None,
+                 'seconds': seconds,
+                 'rows': self.rows,
+                 'peak_bytes': self.peak_bytes,
+                 'error': exc_type.__name__ if exc_type is not None else None}
+        for hook in list(_local.hooks):
+            hook(event)
+        return False
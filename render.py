@@ -0,0 +1,178 @@
+import argparse
+import json
+import os
+import sys
+import traceback
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib as mpl
+import pandas as pd
+
+from chart import SCC, get_template
+from profiling import Report, stage
+
+RenderResult = namedtuple('RenderResult', ['name', 'paths', 'error', 'report'])
+RenderResult.__new__.__defaults__ = (None,)
+
+
+def render_many(jobs, out_dir, workers=None, formats=('png',), profile=False):
+    """
+    render many charts to disk on a process pool, a failing job is reported and does not stop the run
+
+    :param jobs: chart jobs, each a dict with 'name', 'data' (DataFrame or path to a prepared csv) and
+        optionally 'colors', 'markers', 'phase_lines', 'figsize', 'ylim', 'collections', 'chart' as passed to SCC
+    :type jobs: list
+
+    :param out_dir: directory the charts are written to as <name>.<format>
+    :type out_dir: str
+
+    :param workers: number of worker processes, defaults to the number of cpus
+    :type workers: int
+
+    :param formats: file formats to write per chart
+    :type formats: tuple
+
+    :param profile: attach a per stage timing report (see profiling.Report) to every result, 'memory'
+        also traces peak memory per stage
+    :type profile: bool
+
+    :return results: one RenderResult per job in the order the jobs were given
+    :rtype results: list
+    """
+    os.makedirs(out_dir, exist_ok=True)
+
+    jobs = list(jobs)
+    results = [None] * len(jobs)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        futures = {}
+        for i, job in enumerate(jobs):
+            name = job.get('name', f'chart_{i}')
+            futures[executor.submit(_render_job, name, job, out_dir, tuple(formats), profile)] = (i, name)
+
+        for future in as_completed(futures):
+            i, name = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception:   # the worker itself died or the job could not be sent to it
+                results[i] = RenderResult(name, [], traceback.format_exc())
+
+    return results
+
+
+def _init_worker():
+    # workers never display anything, force a headless backend
+    mpl.use('Agg')
+
+
+def _render_job(name, job, out_dir, formats, profile=False):
+    if not profile:
+        return _render(name, job, out_dir, formats)
+
+    with Report(memory=profile == 'memory') as report:
+        result = _render(name, job, out_dir, formats)
+    return result._replace(report=report.to_dict())
+
+
+def _render(name, job, out_dir, formats):
+    try:
+        paths = write_job(name, job, out_dir, formats)
+    except Exception:
+        return RenderResult(name, [], traceback.format_exc())
+
+    return RenderResult(name, paths, None)
+
+
+def write_job(name, job, out_dir, formats=('png',)):
+    """
+    plot a chart job and write it to out_dir as <name>.<format> for every format
+
+    :param name: name of the chart
+    :type name: str
+
+    :param job: chart job as taken by render_many
+    :type job: dict
+
+    :param out_dir: directory the chart is written to
+    :type out_dir: str
+
+    :param formats: file formats to write
+    :type formats: tuple
+
+    :return paths: path of every file written
+    :rtype paths: list
+    """
+    data = job['data']
+    if isinstance(data, str):
+        with stage('render.read_csv') as timing:
+            data = pd.read_csv(data, index_col=0, parse_dates=True)
+            timing.rows = len(data)
+
+    scc = plot_job(data, job)
+    paths = []
+    for fmt in formats:
+        path = os.path.join(out_dir, f'{name}.{fmt}')
+        scc.save(path, format=fmt)
+        paths.append(path)
+    return paths
+
+
+def plot_job(data, job):
+    """
+    plot the data of a chart job, charts sharing figsize, ylim and chart type are drawn onto the same
+     cached template of the thread
+
+    :param data: data of the chart
+    :type data: pd.DataFrame
+
+    :param job: chart job, 'colors', 'markers', 'phase_lines', 'figsize', 'ylim', 'collections' and 'chart'
+        are passed on to SCC, the rest is ignored
+    :type job: dict
+
+    :return scc: plotted chart on its template
+    :rtype scc: SCC
+    """
+    template = get_template(figsize=tuple(job.get('figsize', (11, 9))), ylim=tuple(job.get('ylim', (0.0005, 1000))),
+                            chart=job.get('chart', 'daily'))
+
+    scc = SCC(data,
+              colors=job.get('colors', {}),
+              markers=job.get('markers', {}),
+              phase_lines=job.get('phase_lines', {}),
+              template=template,
+              collections=job.get('collections', False))
+    scc.plot(show=False)
+    return scc
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render Standard Celeration Charts in bulk.')
+    parser.add_argument('manifest',
+                        help='json file holding a list of chart jobs, job data is a path to a prepared csv')
+    parser.add_argument('out_dir', help='directory the charts are written to')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('-f', '--format', dest='formats', action='append', choices=['png', 'svg'],
+                        help='output format, may be given more than once (default: png)')
+    parser.add_argument('-p', '--profile', help='write a per stage timing report of every chart as json to this file')
+    args = parser.parse_args(argv)
+
+    with open(args.manifest) as f:
+        jobs = json.load(f)
+
+    results = render_many(jobs, args.out_dir, workers=args.workers, formats=args.formats or ('png',),
+                          profile=bool(args.profile))
+
+    if args.profile:
+        with open(args.profile, 'w') as f:
+            json.dump({result.name: result.report for result in results}, f, indent=2)
+
+    failed = [result for result in results if result.error is not None]
+    for result in failed:
+        print(f'{result.name} failed:\n{result.error}', file=sys.stderr)
+    print(f'rendered {len(results) - len(failed)} of {len(results)} charts to {args.out_dir}')
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
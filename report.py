@@ -0,0 +1,93 @@
+import argparse
+import json
+import sys
+import traceback
+from collections import namedtuple
+
+from matplotlib.backends.backend_pdf import PdfPages
+
+from render import plot_job
+
+ReportResult = namedtuple('ReportResult', ['name', 'page', 'error'])
+
+
+def write_report(jobs, path, metadata=None):
+    """
+    write many charts into one multi-page PDF, every chart is drawn onto the shared ChartTemplate of its
+     figsize, ylim and chart type and written out as soon as it is drawn
+
+    the PDF embeds every font once for all pages and only one figure per template is ever held, so
+     memory stays flat whatever the number of pages, jobs may be a generator loading one chart at a time.
+     A failing job is reported and gets no page
+
+    :param jobs: chart jobs, each a dict with 'name', 'data' (DataFrame, prepper.series.Series or path to a
+        prepared csv) and optionally 'title' printed over the page (defaults to name) and 'colors', 'markers',
+        'phase_lines', 'figsize', 'ylim', 'collections', 'chart' as passed to SCC
+    :type jobs: iterable
+
+    :param path: path or file-like object the PDF is written to
+    :type path: str
+
+    :param metadata: PDF document information, e.g. {'Title': 'Site audit', 'Author': ...}
+    :type metadata: dict
+
+    :return results: one ReportResult per job in the order the jobs were given, page is the 1-based page of
+        the chart, None when it failed
+    :rtype results: list
+    """
+    results = []
+    with PdfPages(path, metadata=metadata) as pdf:
+        for i, job in enumerate(jobs):
+            name = job.get('name', f'chart_{i}')
+            try:
+                _write_page(pdf, name, job)
+            except Exception:
+                results.append(ReportResult(name, None, traceback.format_exc()))
+                continue
+            results.append(ReportResult(name, pdf.get_pagecount(), None))
+
+    return results
+
+
+def _write_page(pdf, name, job):
+    import pandas as pd
+
+    data = job['data']
+    if isinstance(data, str):
+        data = pd.read_csv(data, index_col=0, parse_dates=True)
+
+    scc = plot_job(data, job)
+    template = scc.template
+
+    # the title is not a data layer of the template, take it off again once the page is written
+    title = template.fig.text(0.01, 0.99, job.get('title', name), va='top', size='small')
+    try:
+        pdf.savefig(template.fig)
+    finally:
+        title.remove()
+        template.clear()     # let go of the page's data right away
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write Standard Celeration Charts into one multi-page PDF.')
+    parser.add_argument('manifest',
+                        help='json file holding a list of chart jobs, job data is a path to a prepared csv')
+    parser.add_argument('pdf', help='path the PDF is written to')
+    parser.add_argument('-t', '--title', help='title of the PDF document')
+    args = parser.parse_args(argv)
+
+    with open(args.manifest) as f:
+        jobs = json.load(f)
+
+    results = write_report(jobs, args.pdf, metadata={'Title': args.title} if args.title else None)
+
+    failed = [result for result in results if result.error is not None]
+    for result in failed:
+        print(f'{result.name} failed:\n{result.error}', file=sys.stderr)
+    print(f'wrote {len(results) - len(failed)} of {len(results)} charts to {args.pdf}')
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,276 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import socketserver
+import sys
+import traceback
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pandas as pd
+
+from chart import get_template
+from prepper.cache import prepare_cr
+from render import plot_job
+
+CONTENT_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+
+class RenderCache:
+    """
+    In memory LRU cache of rendered charts, evicted least recently used first once the rendered bytes
+    grow past max_bytes.
+    """
+
+    def __init__(self, max_bytes=256 << 20):
+        """
+        :param max_bytes: total size of the cached charts the cache is evicted down to
+        :type max_bytes: int
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.__entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def get(self, key):
+        """
+        :param key: content hash of the chart
+        :type key: str
+
+        :return body: rendered chart, None when not cached
+        :rtype body: bytes
+        """
+        body = self.__entries.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+
+        self.__entries.move_to_end(key)    # mark as recently used
+        self.hits += 1
+        return body
+
+    def put(self, key, body):
+        """
+        cache a rendered chart and evict down to max_bytes
+
+        :param key: content hash of the chart
+        :type key: str
+
+        :param body: rendered chart
+        :type body: bytes
+        """
+        if key in self.__entries:
+            self.size -= len(self.__entries.pop(key))
+        self.__entries[key] = body
+        self.size += len(body)
+
+        while self.size > self.max_bytes and self.__entries:
+            _, evicted = self.__entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def to_dict(self):
+        """
+        :return stats: entries, bytes, max_bytes, hits and misses of the cache
+        :rtype stats: dict
+        """
+        return {'entries': len(self), 'bytes': self.size, 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses}
+
+
+class RenderService:
+    """
+    Renders chart jobs onto warm chart templates and serves repeats from a RenderCache.
+
+    A job is a dict like the jobs of render.py: 'data' is either a path to a prepared csv or a prepared
+    DataFrame as given by DataFrame.to_dict(orient='split'). Instead of 'data' a job may name the
+    CentralReach exports with 'timesheets_path' and 'data_path', they are prepared through prepare_cr.
+    'colors', 'markers', 'phase_lines', 'figsize', 'ylim', 'collections', 'chart' are passed on to SCC and
+    'format' is png or svg.
+    """
+
+    def __init__(self, max_bytes=256 << 20, cache_dir='.pyscc_cache'):
+        """
+        :param max_bytes: size of the rendered chart cache
+        :type max_bytes: int
+
+        :param cache_dir: directory of the on disk cache of prepared exports
+        :type cache_dir: str
+        """
+        self.cache = RenderCache(max_bytes)
+        self.cache_dir = cache_dir
+
+    def warm(self, figsize=(11, 9), ylim=(0.0005, 1000)):
+        """
+        build the chart template of figsize and ylim ahead of the first request
+
+        :param figsize: size of the figure
+        :type figsize: tuple
+
+        :param ylim: limits of the y-axis
+        :type ylim: tuple
+        """
+        get_template(figsize=tuple(figsize), ylim=tuple(ylim))
+
+    def render(self, job):
+        """
+        :param job: chart job
+        :type job: dict
+
+        :return body, content_type, hit: rendered chart, its mime type and whether it came from the cache
+        :rtype body, content_type, hit: (bytes, str, bool)
+        """
+        fmt = job.get('format', 'png')
+        if fmt not in CONTENT_TYPES:
+            raise ValueError(f'format must be one of {", ".join(CONTENT_TYPES)}')
+
+        data = self.__load(job)
+        figsize = tuple(job.get('figsize', (11, 9)))
+        ylim = tuple(job.get('ylim', (0.0005, 1000)))
+        chart = job.get('chart', 'daily')
+        key = chart_key(data, colors=job.get('colors', {}), markers=job.get('markers', {}),
+                        phase_lines=job.get('phase_lines', {}), figsize=figsize, ylim=ylim, format=fmt,
+                        collections=job.get('collections', False), chart=chart)
+
+        body = self.cache.get(key)
+        if body is not None:
+            return body, CONTENT_TYPES[fmt], True
+
+        scc = plot_job(data, job)
+        buffer = io.BytesIO()
+        scc.save(buffer, format=fmt)
+        body = buffer.getvalue()
+
+        self.cache.put(key, body)
+        return body, CONTENT_TYPES[fmt], False
+
+    def __load(self, job):
+        if 'timesheets_path' in job:
+            combined, _ = prepare_cr(job['timesheets_path'], job['data_path'], cache_dir=self.cache_dir)
+            return combined[[col for col in combined.columns if col.startswith('data_')] + ['counting']]
+
+        data = job['data']
+        if isinstance(data, str):
+            return pd.read_csv(data, index_col=0, parse_dates=True)
+        return pd.DataFrame(data['data'], index=pd.to_datetime(data['index']), columns=data['columns'])
+
+
+def chart_key(data, **params):
+    """
+    content hash of a chart, equal for equal data and SCC parameters wherever the data came from
+
+    :param data: data of the chart
+    :type data: pd.DataFrame
+
+    :param params: everything else the chart depends on, must be json serializable
+    :return key: hex digest
+    :rtype key: str
+    """
+    digest = hashlib.sha256(pd.util.hash_pandas_object(data, index=True).values.tobytes())
+    digest.update(repr(list(data.columns)).encode())
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class RenderHandler(BaseHTTPRequestHandler):
+    """
+    POST /render with a json chart job returns the chart, GET /stats returns the cache stats as json.
+    """
+
+    def do_GET(self):
+        if self.path != '/stats':
+            self.__send(404, b'not found\n', 'text/plain')
+            return
+        self.__send(200, json.dumps(self.server.service.cache.to_dict()).encode(), 'application/json')
+
+    def do_POST(self):
+        if self.path != '/render':
+            self.__send(404, b'not found\n', 'text/plain')
+            return
+
+        try:
+            job = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            body, content_type, hit = self.server.service.render(job)
+        except Exception:
+            self.__send(400, traceback.format_exc().encode(), 'text/plain')
+            return
+        self.__send(200, body, content_type, {'X-Cache': 'hit' if hit else 'miss'})
+
+    def address_string(self):
+        # clients of a unix socket have no address
+        return self.client_address[0] if self.client_address else 'unix socket'
+
+    def __send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class UnixHTTPServer(socketserver.UnixStreamServer):
+    """
+    HTTPServer on a unix socket
+    """
+
+
+def make_server(service, host='127.0.0.1', port=8050, socket_path=None):
+    """
+    :param service: service answering the requests
+    :type service: RenderService
+
+    :param host: interface to listen on
+    :type host: str
+
+    :param port: port to listen on
+    :type port: int
+
+    :param socket_path: listen on this unix socket instead of host and port
+    :type socket_path: str
+
+    :return server: server, requests are answered one at a time as the templates are shared
+    :rtype server: socketserver.BaseServer
+    """
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixHTTPServer(socket_path, RenderHandler)
+    else:
+        server = HTTPServer((host, port), RenderHandler)
+    server.service = service
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve Standard Celeration Charts from warm templates.')
+    parser.add_argument('--host', default='127.0.0.1', help='interface to listen on')
+    parser.add_argument('-p', '--port', type=int, default=8050, help='port to listen on')
+    parser.add_argument('-s', '--socket', help='listen on this unix socket instead of host and port')
+    parser.add_argument('-m', '--max-mib', type=int, default=256, help='size of the rendered chart cache in MiB')
+    parser.add_argument('-c', '--cache-dir', default='.pyscc_cache', help='directory of the prepared export cache')
+    args = parser.parse_args(argv)
+
+    service = RenderService(max_bytes=args.max_mib << 20, cache_dir=args.cache_dir)
+    service.warm()
+
+    server = make_server(service, host=args.host, port=args.port, socket_path=args.socket)
+    print(f'serving charts on {args.socket or f"http://{args.host}:{args.port}"}', file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
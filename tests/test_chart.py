@@ -0,0 +1,20 @@
+import numpy as np
+
+from benchmarks.synthetic import generate
+from chart import SCC
+from prepper.combine import combine_cr
+
+
+def test_series_charts_only_data_and_counting_columns():
+    timesheets, raw = generate(years=1, seed=0)
+    series = combine_cr(timesheets, raw.drop(columns=['ClientId', 'Target']), compact=True)
+    assert 'counting_time' in series.columns
+
+    scc = SCC(series)
+    assert list(scc.data.columns) == ['data_decel', 'counting']
+    frame = series.to_frame(phase=None)
+    np.testing.assert_allclose(scc.data.dropna(how='all').values, frame[['data_decel', 'counting']].values,
+                               rtol=1e-6)
+
+    scc.append(series)
+    assert list(scc.data.columns) == ['data_decel', 'counting']
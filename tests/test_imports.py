@@ -0,0 +1,12 @@
+import os
+
+from benchmarks.imports import check
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_budgets(monkeypatch):
+    # the probes import the modules from the working directory, PYSCC_IMPORT_SCALE loosens budgets on slow machines
+    monkeypatch.chdir(ROOT)
+    _, failures = check(scale=float(os.environ.get('PYSCC_IMPORT_SCALE', 1.0)))
+    assert not failures, '\n'.join(failures)
@@ -0,0 +1,24 @@
+import threading
+
+from profiling import Report, stage
+
+
+def test_report_only_records_its_own_thread():
+    started, done = threading.Event(), threading.Event()
+
+    def other():
+        started.wait()
+        with stage('other'):
+            pass
+        done.set()
+
+    thread = threading.Thread(target=other)
+    thread.start()
+    with Report() as report:
+        started.set()
+        done.wait()
+        with stage('mine'):
+            pass
+    thread.join()
+
+    assert [event['stage'] for event in report.stages] == ['mine']
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate
+from prepper.combine import combine_cr
+from prepper.stats import (IncrementalStats, batch_within_condition_stats, rolling_stats, stats,
+                           within_condition_stats)
+from prepper.store import phase_table
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2, 3])
+def test_batch_within_condition_stats_matches_per_phase(seed):
+    timesheets, raw = generate(phases=6, years=2, seed=seed)
+    data = combine_cr(timesheets, raw.drop(columns=['ClientId', 'Target']))
+    data['data_accel'] = data.data_decel * np.exp(np.random.default_rng(seed).normal(0., .3, len(data)))
+    batch = batch_within_condition_stats(data.copy())
+
+    # the per phase version only handles phases the z-score filter keeps every point of
+    compared = 0
+    for _, phase in data.groupby('phase', sort=False):
+        values = np.log10(phase[['data_decel', 'data_accel']].values)
+        if (abs((values - values.mean(axis=0)) / values.std(axis=0)) >= 3).any():
+            continue
+        pd.testing.assert_frame_equal(batch.loc[phase.index], within_condition_stats(phase.copy()),
+                                      check_exact=False, rtol=1e-9)
+        compared += 1
+    assert compared
+
+
+def test_incremental_stats_matches_stats():
+    timesheets, raw = generate(phases=6, years=2, seed=4)
+    data = combine_cr(timesheets, raw.drop(columns=['ClientId', 'Target']))
+    data['data_accel'] = data.data_decel * np.exp(np.random.default_rng(4).normal(0., .3, len(data)))
+
+    incremental = IncrementalStats(data.iloc[:-30])
+    for i in range(30, 0, -3):
+        incremental.update(data.iloc[-i:len(data) - i + 3])
+    full, summary = stats(data, return_summary=True)
+    pd.testing.assert_frame_equal(incremental.summary, summary)
+    pd.testing.assert_frame_equal(incremental.data, full)
+
+    # replayed rows refit nothing, changed rows across a phase change refit both phases
+    assert incremental.update(data.iloc[-10:]) == []
+    first = data.phase.ne(data.phase.shift()).values.nonzero()[0][2]
+    changed = data.iloc[first - 5:first + 5].copy()
+    changed['data_decel'] *= 1.5
+    assert sorted(incremental.update(changed)) == sorted(changed.phase.unique())
+    data.iloc[first - 5:first + 5] = changed
+    full, summary = stats(data, return_summary=True)
+    pd.testing.assert_frame_equal(incremental.summary, summary)
+    pd.testing.assert_frame_equal(incremental.data, full)
+
+
+def test_cel_multiplier_is_the_change_of_the_weekly_celeration():
+    # phases of 8 days on exact celeration lines of ÷1.68, ÷1.39, ÷2.24 and ×2.24 per week
+    weekly = [1 / 1.68, 1 / 1.39, 1 / 2.24, 2.24]
+    phase = np.repeat([f'phase {i}' for i in range(len(weekly))], 8)
+    steps = np.repeat(np.log10(weekly) / 7, 8)
+    data = pd.DataFrame({'data_decel': 10 ** (1 + np.r_[0., np.cumsum(steps)[:-1]]), 'phase': phase},
+                        index=pd.date_range('2020-01-06', periods=len(phase)))
+
+    data, summary = stats(data, return_summary=True)
+    assert summary.cel_value.tolist() == ['\xF71.68', '\xF71.39', '\xF72.24', '\xD72.24']
+    # ÷1.68 to ÷1.39 speeds up by 1.68 / 1.39, ÷2.24 to ×2.24 by 2.24 * 2.24
+    assert pd.isna(summary.cel_multiplier.iloc[0])
+    assert summary.cel_multiplier.tolist()[1:] == ['\xD71.21', '\xF71.61', '\xD75.02']
+    assert data.cel_multiplier_decel.iloc[8::8].tolist() == ['\xD71.21', '\xF71.61', '\xD75.02']
+
+    table = phase_table(data, client=1, target='target')
+    np.testing.assert_allclose(table.cel_multiplier.values, [np.nan, 1.68 / 1.39, -2.24 / 1.39, 2.24 * 2.24],
+                               rtol=1e-9)
+
+
+@pytest.mark.parametrize('window', [7, 21, 28])
+def test_rolling_stats_matches_polyfit_per_window(window):
+    rng = np.random.default_rng(window)
+    # irregular days over about two years, so windows start in the block of window days before theirs
+    days = np.cumsum(rng.integers(1, 4, 300))
+    data = pd.DataFrame({'data_decel': 10 ** (1 - days / 400 + rng.normal(0., .2, len(days))),
+                         'data_accel': 10 ** (rng.normal(0., .3, len(days))),
+                         'phase': np.repeat(['baseline', 'intervention', 'maintenance'], [90, 130, 80])},
+                        index=pd.Timestamp('2019-01-01') + pd.to_timedelta(days, unit='D'))
+    data.loc[data.index[::5], 'data_accel'] = np.nan
+    out = rolling_stats(data.copy(), window=window)
+
+    phase = data.phase.values
+    starts = np.maximum.accumulate(np.where(np.r_[True, phase[1:] != phase[:-1]], np.arange(len(days)), 0))
+    for col in ('data_decel', 'data_accel'):
+        name = col[len('data_'):]
+        values = np.log10(data[col].values)
+        for i in range(len(days)):
+            rows = np.arange(starts[i], i + 1)
+            rows = rows[(days[rows] > days[i] - window) & np.isfinite(values[rows])]
+            if len(rows) < 3:
+                assert np.isnan(out[f'rolling_celeration_{name}'].iloc[i])
+                continue
+            slope, intercept = np.polyfit(days[rows], values[rows], 1)
+            spread = 2 * (values[rows] - (intercept + slope * days[rows])).std()
+            line = intercept + slope * days[i]
+            np.testing.assert_allclose([out[f'rolling_{kind}_{name}'].iloc[i]
+                                        for kind in ('celeration', 'up_bounce', 'down_bounce')],
+                                       10 ** np.array([line, line + spread, line - spread]), rtol=1e-9)
+            assert out[f'rolling_cel_value_{name}'].iloc[i] == \
+                ('\xD7' if slope > 0 else '\xF7') + f'{10 ** (7 * abs(slope)):.2f}'
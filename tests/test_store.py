@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate
+from prepper.combine import combine_all
+from prepper.parallel import stats_all
+from prepper.store import CaseloadStore, phase_table
+
+KEY = ['client', 'target', 'set', 'phase']
+
+
+@pytest.fixture(scope='module')
+def caseload():
+    timesheets, raw = generate(clients=6, targets=3, phases=4, years=1, seed=1)
+    combined = combine_all(timesheets, raw)
+    return combined, stats_all(combined, workers=1)
+
+
+def brute_force(table, client=None, target=None, phase=None, set=None, date=None, current=None,
+                celeration=None, bounce=None):
+    mask = np.ones(len(table), dtype=bool)
+    for name, value in (('client', client), ('target', target), ('phase', phase), ('set', set)):
+        if value is not None:
+            mask &= table[name].isin(value if isinstance(value, list) else [value])
+    if date is not None:
+        first, last = date
+        mask &= (table.start <= last) & (table.end >= first)
+    if current is not None:
+        mask &= table.current == current
+    for name, bounds in (('celeration', celeration), ('bounce', bounce)):
+        if bounds is not None:
+            low, high = (-np.inf if bounds[0] is None else bounds[0]), (np.inf if bounds[1] is None else bounds[1])
+            mask &= (table[name] >= low) & (table[name] <= high)
+    return table[mask]
+
+
+def assert_same_rows(rows, expected):
+    pd.testing.assert_frame_equal(rows.sort_values(KEY).reset_index(drop=True),
+                                  expected.sort_values(KEY).reset_index(drop=True), check_dtype=False)
+
+
+def test_store_matches_phase_table_after_update_and_remove(caseload):
+    combined, stats = caseload
+    clients = stats.index.get_level_values(0).unique()
+    target = stats.loc[clients[2]].index.get_level_values(0)[0]
+
+    store = CaseloadStore()
+    store.update(stats)
+
+    # recompute one client on changed data, drop another client and a target of a third
+    changed = combined.loc[[clients[0]]].copy()
+    changed['data_decel'] *= 2
+    restated = stats_all(changed, workers=1)
+    store.update(restated)
+    store.remove(clients[1])
+    store.remove(clients[2], target)
+
+    held = pd.concat([stats.drop(index=clients[:2], level=0), restated])
+    held = held[~((held.index.get_level_values(0) == clients[2]) & (held.index.get_level_values(1) == target))]
+    table = phase_table(held)
+    assert_same_rows(store.table, table)
+
+    monday = pd.Timestamp('2019-06-03')
+    week = (monday, monday + pd.Timedelta(days=6))
+    queries = [dict(),
+               dict(client=clients[0]),
+               dict(client=[clients[0], clients[2]], target=target),
+               dict(current=True, celeration=(None, -1.1)),
+               dict(current=False, bounce=(2., None)),
+               dict(date=week),
+               dict(date=week, celeration=(1., None)),
+               dict(celeration=(1.05, 1.5), set='decel'),
+               dict(phase=table.phase.iloc[0], bounce=(3., None))]
+    for query in queries:
+        assert_same_rows(store.query(**query), brute_force(table, **query))
+    # chart values are the signed multipliers they read as
+    assert_same_rows(store.query(current=True, celeration=(None, '÷1.1')),
+                     store.query(current=True, celeration=(None, -1.1)))
+
+    for column, filters in (('bounce', dict(date=week)), ('celeration', dict()), ('cel_multiplier', dict())):
+        for largest in (True, False):
+            top = store.top(column, k=5, largest=largest, **filters)
+            expected = brute_force(table, **filters)[column].dropna().sort_values(ascending=not largest).head(5)
+            np.testing.assert_allclose(top[column].values, expected.values)